@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
+import sys
 import time
 import argparse
+import subprocess
 import gym_minigrid
 import gym
 from gym_minigrid.wrappers import *
@@ -15,8 +17,21 @@ parser.add_argument(
 )
 parser.add_argument("--num_resets", default=200)
 parser.add_argument("--num_frames", default=5000)
+parser.add_argument("--num_imports", default=5)
 args = parser.parse_args()
 
+# Benchmark the package import in fresh interpreters, with gym preloaded
+import_code = (
+    'import sys, time, gym; t0 = time.time(); import gym_minigrid; '
+    'print(time.time() - t0, "ray" in sys.modules)'
+)
+import_times = []
+for i in range(args.num_imports):
+    out = subprocess.check_output([sys.executable, '-c', import_code])
+    dt, ray_imported = out.decode().split()
+    import_times.append(float(dt))
+import_time = 1000 * min(import_times)
+
 env = gym.make(args.env_name)
 
 # Benchmark env.reset
@@ -35,6 +50,21 @@ t1 = time.time()
 dt = t1 - t0
 frames_per_sec = args.num_frames / dt
 
+# Benchmark env.step, and its overhead over generating the observation
+env = gym.make(args.env_name).unwrapped
+env.max_steps = float('inf')
+env.reset()
+actions = [env.actions.left, env.actions.forward, env.actions.right, env.actions.toggle]
+t0 = time.time()
+for i in range(args.num_frames):
+    env.step(actions[i % len(actions)])
+t1 = time.time()
+for i in range(args.num_frames):
+    env.gen_obs()
+t2 = time.time()
+step_time = (1e6 * (t1 - t0)) / args.num_frames
+step_overhead = (1e6 * ((t1 - t0) - (t2 - t1))) / args.num_frames
+
 # Create an environment with an RGB agent observation
 env = gym.make(args.env_name)
 env = RGBImgPartialObsWrapper(env)
@@ -48,6 +78,8 @@ t1 = time.time()
 dt = t1 - t0
 agent_view_fps = args.num_frames / dt
 
+print('Import time   : {:.1f} ms (ray imported: {})'.format(import_time, ray_imported))
 print('Env reset time: {:.1f} ms'.format(reset_time))
+print('Env step time : {:.1f} us ({:.1f} us excluding the observation)'.format(step_time, step_overhead))
 print('Rendering FPS : {:.0f}'.format(frames_per_sec))
 print('Agent view FPS: {:.0f}'.format(agent_view_fps))
@@ -1,5 +1,13 @@
+import importlib
+
 # Import the envs module so that envs register themselves
+# Env modules themselves are only imported when an env is created
 import gym_minigrid.envs
 
-# Import wrappers so it's accessible when installing with pip
-import gym_minigrid.wrappers
+
+def __getattr__(name):
+    # Import wrappers on first access, so that they are still accessible
+    # when installing with pip without slowing down the package import
+    if name in ('wrappers', 'vector', 'recording', 'replay', 'levels'):
+        return importlib.import_module('gym_minigrid.' + name)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
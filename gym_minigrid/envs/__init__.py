@@ -1,26 +1,551 @@
-from gym_minigrid.envs.empty import *
-from gym_minigrid.envs.doorkey import *
-from gym_minigrid.envs.multiroom import *
-from gym_minigrid.envs.fetch import *
-from gym_minigrid.envs.gotoobject import *
-from gym_minigrid.envs.gotodoor import *
-from gym_minigrid.envs.putnear import *
-from gym_minigrid.envs.lockedroom import *
-from gym_minigrid.envs.keycorridor import *
-from gym_minigrid.envs.unlock import *
-from gym_minigrid.envs.unlockpickup import *
-from gym_minigrid.envs.blockedunlockpickup import *
-from gym_minigrid.envs.playground_v0 import *
-from gym_minigrid.envs.redbluedoors import *
-from gym_minigrid.envs.obstructedmaze import *
-from gym_minigrid.envs.memory import *
-from gym_minigrid.envs.fourrooms import *
-from gym_minigrid.envs.crossing import *
-from gym_minigrid.envs.lavagap import *
-from gym_minigrid.envs.dynamicobstacles import *
-from gym_minigrid.envs.distshift import *
-from gym_minigrid.envs.multiagent.ma_empty import *
-from gym_minigrid.envs.multiagent.ma_multidoor_counter import *
-from gym_minigrid.envs.multiagent.ma_shared_space import *
-from gym_minigrid.envs.multiagent.ma_circ import *
-from gym_minigrid.envs.multiagent.ma_countercirc import *
\ No newline at end of file
+import importlib
+from gym_minigrid.register import register
+
+# Environments are registered with entry points pointing to the modules
+# defining them, so that these modules are only imported when an
+# environment is created with gym.make
+
+register(
+    id='MiniGrid-Empty-5x5-v0',
+    entry_point='gym_minigrid.envs.empty:EmptyEnv5x5'
+)
+
+register(
+    id='MiniGrid-Empty-Random-5x5-v0',
+    entry_point='gym_minigrid.envs.empty:EmptyRandomEnv5x5'
+)
+
+register(
+    id='MiniGrid-Empty-6x6-v0',
+    entry_point='gym_minigrid.envs.empty:EmptyEnv6x6'
+)
+
+register(
+    id='MiniGrid-Empty-Random-6x6-v0',
+    entry_point='gym_minigrid.envs.empty:EmptyRandomEnv6x6'
+)
+
+register(
+    id='MiniGrid-Empty-8x8-v0',
+    entry_point='gym_minigrid.envs.empty:EmptyEnv'
+)
+
+register(
+    id='MiniGrid-Empty-16x16-v0',
+    entry_point='gym_minigrid.envs.empty:EmptyEnv16x16'
+)
+
+register(
+    id='MiniGrid-DoorKey-5x5-v0',
+    entry_point='gym_minigrid.envs.doorkey:DoorKeyEnv5x5'
+)
+
+register(
+    id='MiniGrid-DoorKey-6x6-v0',
+    entry_point='gym_minigrid.envs.doorkey:DoorKeyEnv6x6'
+)
+
+register(
+    id='MiniGrid-DoorKey-8x8-v0',
+    entry_point='gym_minigrid.envs.doorkey:DoorKeyEnv'
+)
+
+register(
+    id='MiniGrid-DoorKey-16x16-v0',
+    entry_point='gym_minigrid.envs.doorkey:DoorKeyEnv16x16'
+)
+
+register(
+    id='MiniGrid-MultiRoom-N2-S4-v0',
+    entry_point='gym_minigrid.envs.multiroom:MultiRoomEnvN2S4'
+)
+
+register(
+    id='MiniGrid-MultiRoom-N4-S5-v0',
+    entry_point='gym_minigrid.envs.multiroom:MultiRoomEnvN4S5'
+)
+
+register(
+    id='MiniGrid-MultiRoom-N6-v0',
+    entry_point='gym_minigrid.envs.multiroom:MultiRoomEnvN6'
+)
+
+register(
+    id='MiniGrid-Fetch-5x5-N2-v0',
+    entry_point='gym_minigrid.envs.fetch:FetchEnv5x5N2'
+)
+
+register(
+    id='MiniGrid-Fetch-6x6-N2-v0',
+    entry_point='gym_minigrid.envs.fetch:FetchEnv6x6N2'
+)
+
+register(
+    id='MiniGrid-Fetch-8x8-N3-v0',
+    entry_point='gym_minigrid.envs.fetch:FetchEnv'
+)
+
+register(
+    id='MiniGrid-GoToObject-6x6-N2-v0',
+    entry_point='gym_minigrid.envs.gotoobject:GoToObjectEnv'
+)
+
+register(
+    id='MiniGrid-GoToObject-8x8-N2-v0',
+    entry_point='gym_minigrid.envs.gotoobject:GotoEnv8x8N2'
+)
+
+register(
+    id='MiniGrid-GoToDoor-5x5-v0',
+    entry_point='gym_minigrid.envs.gotodoor:GoToDoorEnv'
+)
+
+register(
+    id='MiniGrid-GoToDoor-6x6-v0',
+    entry_point='gym_minigrid.envs.gotodoor:GoToDoor6x6Env'
+)
+
+register(
+    id='MiniGrid-GoToDoor-8x8-v0',
+    entry_point='gym_minigrid.envs.gotodoor:GoToDoor8x8Env'
+)
+
+register(
+    id='MiniGrid-PutNear-6x6-N2-v0',
+    entry_point='gym_minigrid.envs.putnear:PutNearEnv'
+)
+
+register(
+    id='MiniGrid-PutNear-8x8-N3-v0',
+    entry_point='gym_minigrid.envs.putnear:PutNear8x8N3'
+)
+
+register(
+    id='MiniGrid-LockedRoom-v0',
+    entry_point='gym_minigrid.envs.lockedroom:LockedRoom'
+)
+
+register(
+    id='MiniGrid-KeyCorridorS3R1-v0',
+    entry_point='gym_minigrid.envs.keycorridor:KeyCorridorS3R1'
+)
+
+register(
+    id='MiniGrid-KeyCorridorS3R2-v0',
+    entry_point='gym_minigrid.envs.keycorridor:KeyCorridorS3R2'
+)
+
+register(
+    id='MiniGrid-KeyCorridorS3R3-v0',
+    entry_point='gym_minigrid.envs.keycorridor:KeyCorridorS3R3'
+)
+
+register(
+    id='MiniGrid-KeyCorridorS4R3-v0',
+    entry_point='gym_minigrid.envs.keycorridor:KeyCorridorS4R3'
+)
+
+register(
+    id='MiniGrid-KeyCorridorS5R3-v0',
+    entry_point='gym_minigrid.envs.keycorridor:KeyCorridorS5R3'
+)
+
+register(
+    id='MiniGrid-KeyCorridorS6R3-v0',
+    entry_point='gym_minigrid.envs.keycorridor:KeyCorridorS6R3'
+)
+
+register(
+    id='MiniGrid-Unlock-v0',
+    entry_point='gym_minigrid.envs.unlock:Unlock'
+)
+
+register(
+    id='MiniGrid-UnlockPickup-v0',
+    entry_point='gym_minigrid.envs.unlockpickup:UnlockPickup'
+)
+
+register(
+    id='MiniGrid-BlockedUnlockPickup-v0',
+    entry_point='gym_minigrid.envs.blockedunlockpickup:BlockedUnlockPickup'
+)
+
+register(
+    id='MiniGrid-Playground-v0',
+    entry_point='gym_minigrid.envs.playground_v0:PlaygroundV0'
+)
+
+register(
+    id='MiniGrid-RedBlueDoors-6x6-v0',
+    entry_point='gym_minigrid.envs.redbluedoors:RedBlueDoorEnv6x6'
+)
+
+register(
+    id='MiniGrid-RedBlueDoors-8x8-v0',
+    entry_point='gym_minigrid.envs.redbluedoors:RedBlueDoorEnv'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-1Dl-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_1Dl'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-1Dlh-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_1Dlh'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-1Dlhb-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_1Dlhb'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-2Dl-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_2Dl'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-2Dlh-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_2Dlh'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-2Dlhb-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_2Dlhb'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-1Q-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_1Q'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-2Q-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_2Q'
+)
+
+register(
+    id='MiniGrid-ObstructedMaze-Full-v0',
+    entry_point='gym_minigrid.envs.obstructedmaze:ObstructedMaze_Full'
+)
+
+register(
+    id='MiniGrid-MemoryS17Random-v0',
+    entry_point='gym_minigrid.envs.memory:MemoryS17Random'
+)
+
+register(
+    id='MiniGrid-MemoryS13Random-v0',
+    entry_point='gym_minigrid.envs.memory:MemoryS13Random'
+)
+
+register(
+    id='MiniGrid-MemoryS13-v0',
+    entry_point='gym_minigrid.envs.memory:MemoryS13'
+)
+
+register(
+    id='MiniGrid-MemoryS11-v0',
+    entry_point='gym_minigrid.envs.memory:MemoryS11'
+)
+
+register(
+    id='MiniGrid-MemoryS9-v0',
+    entry_point='gym_minigrid.envs.memory:MemoryS9'
+)
+
+register(
+    id='MiniGrid-MemoryS7-v0',
+    entry_point='gym_minigrid.envs.memory:MemoryS7'
+)
+
+register(
+    id='MiniGrid-FourRooms-v0',
+    entry_point='gym_minigrid.envs.fourrooms:FourRoomsEnv'
+)
+
+register(
+    id='MiniGrid-LavaCrossingS9N1-v0',
+    entry_point='gym_minigrid.envs.crossing:LavaCrossingEnv'
+)
+
+register(
+    id='MiniGrid-LavaCrossingS9N2-v0',
+    entry_point='gym_minigrid.envs.crossing:LavaCrossingS9N2Env'
+)
+
+register(
+    id='MiniGrid-LavaCrossingS9N3-v0',
+    entry_point='gym_minigrid.envs.crossing:LavaCrossingS9N3Env'
+)
+
+register(
+    id='MiniGrid-LavaCrossingS11N5-v0',
+    entry_point='gym_minigrid.envs.crossing:LavaCrossingS11N5Env'
+)
+
+register(
+    id='MiniGrid-SimpleCrossingS9N1-v0',
+    entry_point='gym_minigrid.envs.crossing:SimpleCrossingEnv'
+)
+
+register(
+    id='MiniGrid-SimpleCrossingS9N2-v0',
+    entry_point='gym_minigrid.envs.crossing:SimpleCrossingS9N2Env'
+)
+
+register(
+    id='MiniGrid-SimpleCrossingS9N3-v0',
+    entry_point='gym_minigrid.envs.crossing:SimpleCrossingS9N3Env'
+)
+
+register(
+    id='MiniGrid-SimpleCrossingS11N5-v0',
+    entry_point='gym_minigrid.envs.crossing:SimpleCrossingS11N5Env'
+)
+
+register(
+    id='MiniGrid-LavaGapS5-v0',
+    entry_point='gym_minigrid.envs.lavagap:LavaGapS5Env'
+)
+
+register(
+    id='MiniGrid-LavaGapS6-v0',
+    entry_point='gym_minigrid.envs.lavagap:LavaGapS6Env'
+)
+
+register(
+    id='MiniGrid-LavaGapS7-v0',
+    entry_point='gym_minigrid.envs.lavagap:LavaGapS7Env'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-5x5-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesEnv5x5'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-Random-5x5-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesRandomEnv5x5'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-6x6-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesEnv6x6'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-Random-6x6-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesRandomEnv6x6'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-8x8-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesEnv'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-16x16-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesEnv16x16'
+)
+
+register(
+    id='MiniGrid-Dynamic-Obstacles-64x64-v0',
+    entry_point='gym_minigrid.envs.dynamicobstacles:DynamicObstaclesEnv64x64'
+)
+
+register(
+    id='MiniGrid-DistShift1-v0',
+    entry_point='gym_minigrid.envs.distshift:DistShift1'
+)
+
+register(
+    id='MiniGrid-DistShift2-v0',
+    entry_point='gym_minigrid.envs.distshift:DistShift2'
+)
+
+register(
+    id='MiniGrid-MA-Empty-8x8-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_empty:MAEmptyEnv'
+)
+
+register(
+    id='MiniGrid-MA-Empty-Crowd-32x32-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_empty:MAEmptyCrowdEnv32x32'
+)
+
+register(
+    id='MiniGrid-MA-MultidoorCounter-5x11-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_multidoor_counter:MultidoorCounter5x11'
+)
+
+register(
+    id='MiniGrid-MA-MultidoorCounter-6x11-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_multidoor_counter:MultidoorCounter6x11'
+)
+
+register(
+    id='MiniGrid-MA-MultidoorCounter-Random-6x11-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_multidoor_counter:MultidoorCounter6x11Random'
+)
+
+register(
+    id='MiniGrid-MA-SharedSpace-7x7-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_shared_space:SharedSpace7x7'
+)
+
+register(
+    id='MiniGrid-MA-SharedSpace-6x11-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_shared_space:SharedSpace6x8'
+)
+
+register(
+    id='MiniGrid-MA-SharedSpace-Random-6x11-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_shared_space:SharedSpace6x11Random'
+)
+
+register(
+    id='MiniGrid-MA-Circ-8x8-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_circ:MACircEnv'
+)
+
+register(
+    id='MiniGrid-MA-MACounterCirc-v0',
+    entry_point='gym_minigrid.envs.multiagent.ma_countercirc:MACounterCirc'
+)
+
+# Modules defining the environment classes, imported on first access
+_ENV_CLASS_MODULES = {
+    'EmptyEnv': 'gym_minigrid.envs.empty',
+    'EmptyEnv5x5': 'gym_minigrid.envs.empty',
+    'EmptyRandomEnv5x5': 'gym_minigrid.envs.empty',
+    'EmptyEnv6x6': 'gym_minigrid.envs.empty',
+    'EmptyRandomEnv6x6': 'gym_minigrid.envs.empty',
+    'EmptyEnv16x16': 'gym_minigrid.envs.empty',
+    'DoorKeyEnv': 'gym_minigrid.envs.doorkey',
+    'DoorKeyEnv5x5': 'gym_minigrid.envs.doorkey',
+    'DoorKeyEnv6x6': 'gym_minigrid.envs.doorkey',
+    'DoorKeyEnv16x16': 'gym_minigrid.envs.doorkey',
+    'Room': 'gym_minigrid.envs.lockedroom',
+    'MultiRoomEnv': 'gym_minigrid.envs.multiroom',
+    'MultiRoomEnvN2S4': 'gym_minigrid.envs.multiroom',
+    'MultiRoomEnvN4S5': 'gym_minigrid.envs.multiroom',
+    'MultiRoomEnvN6': 'gym_minigrid.envs.multiroom',
+    'FetchEnv': 'gym_minigrid.envs.fetch',
+    'FetchEnv5x5N2': 'gym_minigrid.envs.fetch',
+    'FetchEnv6x6N2': 'gym_minigrid.envs.fetch',
+    'GoToObjectEnv': 'gym_minigrid.envs.gotoobject',
+    'GotoEnv8x8N2': 'gym_minigrid.envs.gotoobject',
+    'GoToDoorEnv': 'gym_minigrid.envs.gotodoor',
+    'GoToDoor8x8Env': 'gym_minigrid.envs.gotodoor',
+    'GoToDoor6x6Env': 'gym_minigrid.envs.gotodoor',
+    'PutNearEnv': 'gym_minigrid.envs.putnear',
+    'PutNear8x8N3': 'gym_minigrid.envs.putnear',
+    'LockedRoom': 'gym_minigrid.envs.lockedroom',
+    'KeyCorridor': 'gym_minigrid.envs.keycorridor',
+    'KeyCorridorS3R1': 'gym_minigrid.envs.keycorridor',
+    'KeyCorridorS3R2': 'gym_minigrid.envs.keycorridor',
+    'KeyCorridorS3R3': 'gym_minigrid.envs.keycorridor',
+    'KeyCorridorS4R3': 'gym_minigrid.envs.keycorridor',
+    'KeyCorridorS5R3': 'gym_minigrid.envs.keycorridor',
+    'KeyCorridorS6R3': 'gym_minigrid.envs.keycorridor',
+    'Unlock': 'gym_minigrid.envs.unlock',
+    'UnlockPickup': 'gym_minigrid.envs.unlockpickup',
+    'BlockedUnlockPickup': 'gym_minigrid.envs.blockedunlockpickup',
+    'PlaygroundV0': 'gym_minigrid.envs.playground_v0',
+    'RedBlueDoorEnv': 'gym_minigrid.envs.redbluedoors',
+    'RedBlueDoorEnv6x6': 'gym_minigrid.envs.redbluedoors',
+    'ObstructedMazeEnv': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_1Dlhb': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_1Dl': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_1Dlh': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_Full': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_2Dl': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_2Dlh': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_2Dlhb': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_1Q': 'gym_minigrid.envs.obstructedmaze',
+    'ObstructedMaze_2Q': 'gym_minigrid.envs.obstructedmaze',
+    'MemoryEnv': 'gym_minigrid.envs.memory',
+    'MemoryS17Random': 'gym_minigrid.envs.memory',
+    'MemoryS13Random': 'gym_minigrid.envs.memory',
+    'MemoryS13': 'gym_minigrid.envs.memory',
+    'MemoryS11': 'gym_minigrid.envs.memory',
+    'MemoryS9': 'gym_minigrid.envs.memory',
+    'MemoryS7': 'gym_minigrid.envs.memory',
+    'FourRoomsEnv': 'gym_minigrid.envs.fourrooms',
+    'CrossingEnv': 'gym_minigrid.envs.crossing',
+    'LavaCrossingEnv': 'gym_minigrid.envs.crossing',
+    'LavaCrossingS9N2Env': 'gym_minigrid.envs.crossing',
+    'LavaCrossingS9N3Env': 'gym_minigrid.envs.crossing',
+    'LavaCrossingS11N5Env': 'gym_minigrid.envs.crossing',
+    'SimpleCrossingEnv': 'gym_minigrid.envs.crossing',
+    'SimpleCrossingS9N2Env': 'gym_minigrid.envs.crossing',
+    'SimpleCrossingS9N3Env': 'gym_minigrid.envs.crossing',
+    'SimpleCrossingS11N5Env': 'gym_minigrid.envs.crossing',
+    'LavaGapEnv': 'gym_minigrid.envs.lavagap',
+    'LavaGapS5Env': 'gym_minigrid.envs.lavagap',
+    'LavaGapS6Env': 'gym_minigrid.envs.lavagap',
+    'LavaGapS7Env': 'gym_minigrid.envs.lavagap',
+    'DynamicObstaclesEnv': 'gym_minigrid.envs.dynamicobstacles',
+    'DynamicObstaclesEnv5x5': 'gym_minigrid.envs.dynamicobstacles',
+    'DynamicObstaclesRandomEnv5x5': 'gym_minigrid.envs.dynamicobstacles',
+    'DynamicObstaclesEnv6x6': 'gym_minigrid.envs.dynamicobstacles',
+    'DynamicObstaclesRandomEnv6x6': 'gym_minigrid.envs.dynamicobstacles',
+    'DynamicObstaclesEnv16x16': 'gym_minigrid.envs.dynamicobstacles',
+    'DynamicObstaclesEnv64x64': 'gym_minigrid.envs.dynamicobstacles',
+    'DistShiftEnv': 'gym_minigrid.envs.distshift',
+    'DistShift1': 'gym_minigrid.envs.distshift',
+    'DistShift2': 'gym_minigrid.envs.distshift',
+    'MAEmptyEnv': 'gym_minigrid.envs.multiagent.ma_empty',
+    'MAEmptyCrowdEnv32x32': 'gym_minigrid.envs.multiagent.ma_empty',
+    'MultidoorCounter': 'gym_minigrid.envs.multiagent.ma_multidoor_counter',
+    'MultidoorCounter5x11': 'gym_minigrid.envs.multiagent.ma_multidoor_counter',
+    'MultidoorCounter6x11': 'gym_minigrid.envs.multiagent.ma_multidoor_counter',
+    'MultidoorCounter6x11Random': 'gym_minigrid.envs.multiagent.ma_multidoor_counter',
+    'SharedSpace': 'gym_minigrid.envs.multiagent.ma_shared_space',
+    'SharedSpace7x7': 'gym_minigrid.envs.multiagent.ma_shared_space',
+    'SharedSpace6x8': 'gym_minigrid.envs.multiagent.ma_shared_space',
+    'SharedSpace6x11Random': 'gym_minigrid.envs.multiagent.ma_shared_space',
+    'MACircEnv': 'gym_minigrid.envs.multiagent.ma_circ',
+    'MACounterCirc': 'gym_minigrid.envs.multiagent.ma_countercirc',
+}
+
+
+# Module of each name exported by 'from gym_minigrid.envs import *', found
+# on first use
+_exports = None
+
+
+def _export_modules():
+    """
+    Get the module of each name exported by a star import of this package:
+    the public names of the environment modules, as when they were all
+    star-imported by it, which include the names they import themselves
+    """
+
+    global _exports
+    if _exports is None:
+        _exports = {'register': 'gym_minigrid.register'}
+        for module in sorted(set(_ENV_CLASS_MODULES.values())):
+            for name in vars(importlib.import_module(module)):
+                if not name.startswith('_'):
+                    _exports.setdefault(name, module)
+    return _exports
+
+
+def __getattr__(name):
+    if name in _ENV_CLASS_MODULES:
+        return getattr(importlib.import_module(_ENV_CLASS_MODULES[name]), name)
+
+    if name == '__all__':
+        return list(_export_modules())
+
+    if not name.startswith('_') and name in _export_modules():
+        return getattr(importlib.import_module(_export_modules()[name]), name)
+
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_export_modules()))
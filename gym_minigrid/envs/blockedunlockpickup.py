@@ -1,6 +1,5 @@
 from gym_minigrid.minigrid import *
 from gym_minigrid.roomgrid import RoomGrid
-from gym_minigrid.register import register
 
 
 class BlockedUnlockPickup(RoomGrid):
@@ -46,8 +45,3 @@ class BlockedUnlockPickup(RoomGrid):
                 done = True
 
         return obs, reward, done, info
-
-register(
-    id='MiniGrid-BlockedUnlockPickup-v0',
-    entry_point='gym_minigrid.envs:BlockedUnlockPickup'
-)
@@ -1,7 +1,9 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 from operator import add
 
+# Offsets of the cells an obstacle can move to, around its position
+NEIGHBOR_OFFSETS = np.array([(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1)])
+
 class DynamicObstaclesEnv(MiniGridEnv):
     """
     Single-room square grid environment with moving obstacles
@@ -67,15 +69,10 @@ class DynamicObstaclesEnv(MiniGridEnv):
         not_clear = front_cell and front_cell.type != 'goal'
 
         # Update obstacle positions
-        for i_obst in range(len(self.obstacles)):
-            old_pos = self.obstacles[i_obst].cur_pos
-            top = tuple(map(add, old_pos, (-1, -1)))
-
-            try:
-                self.place_obj(self.obstacles[i_obst], top=top, size=(3,3), max_tries=100)
-                self.grid.set(*old_pos, None)
-            except:
-                pass
+        if self.legacy_placement:
+            self._move_obstacles_legacy()
+        else:
+            self._move_obstacles()
 
         # Update the agent's position/direction
         obs, reward, done, info = MiniGridEnv.step(self, action)
@@ -88,6 +85,59 @@ class DynamicObstaclesEnv(MiniGridEnv):
 
         return obs, reward, done, info
 
+    def _move_obstacles(self):
+        """
+        Move all the obstacles at once, each one to a cell picked uniformly
+        among the free cells around it. When several obstacles pick the same
+        cell, the first one in the list of obstacles moves there and the
+        others stay in place.
+        """
+
+        if not self.obstacles:
+            return
+
+        pos = np.array([obst.cur_pos for obst in self.obstacles])
+        height = self.grid.height
+
+        free = self.grid.encoding[:, :, 0] == OBJECT_TO_IDX['empty']
+        for agent_pos in self.occupancy:
+            free[agent_pos] = False
+
+        # Free cells around each obstacle, and the one picked by each obstacle
+        cells = pos[:, None, :] + NEIGHBOR_OFFSETS
+        keys = cells[:, :, 0] * height + cells[:, :, 1]
+        cand = free.ravel()[keys]
+        counts = cand.sum(axis=1)
+        choice = (self.np_random.random_sample(len(pos)) * counts).astype(int)
+        idx = (cand.cumsum(axis=1) > choice[:, None]).argmax(axis=1)
+        picked = keys[np.arange(len(pos)), idx]
+
+        # Keep the first obstacle picking each cell, among those which can move
+        movers = np.flatnonzero(counts)
+        _, first = np.unique(picked[movers], return_index=True)
+        movers = movers[first]
+
+        target = cells[movers, idx[movers]]
+        self.grid.move_objs(pos[movers], target)
+        for i, obst_pos in zip(movers.tolist(), target):
+            self.obstacles[i].cur_pos = obst_pos
+
+    def _move_obstacles_legacy(self):
+        """
+        Move the obstacles one at a time with place_obj, as earlier
+        versions did
+        """
+
+        for i_obst in range(len(self.obstacles)):
+            old_pos = self.obstacles[i_obst].cur_pos
+            top = tuple(map(add, old_pos, (-1, -1)))
+
+            try:
+                self.place_obj(self.obstacles[i_obst], top=top, size=(3,3), max_tries=100)
+                self.grid.set(*old_pos, None)
+            except:
+                pass
+
 class DynamicObstaclesEnv5x5(DynamicObstaclesEnv):
     def __init__(self):
         super().__init__(size=5, n_obstacles=2)
@@ -108,32 +158,6 @@ class DynamicObstaclesEnv16x16(DynamicObstaclesEnv):
     def __init__(self):
         super().__init__(size=16, n_obstacles=8)
 
-register(
-    id='MiniGrid-Dynamic-Obstacles-5x5-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv5x5'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-Random-5x5-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesRandomEnv5x5'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-6x6-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv6x6'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-Random-6x6-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesRandomEnv6x6'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-8x8-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv'
-)
-
-register(
-    id='MiniGrid-Dynamic-Obstacles-16x16-v0',
-    entry_point='gym_minigrid.envs:DynamicObstaclesEnv16x16'
-)
+class DynamicObstaclesEnv64x64(DynamicObstaclesEnv):
+    def __init__(self):
+        super().__init__(size=64, n_obstacles=32)
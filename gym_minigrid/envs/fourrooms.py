@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 
 class FourRoomsEnv(MiniGridEnv):
@@ -67,12 +66,3 @@ class FourRoomsEnv(MiniGridEnv):
             self.place_obj(Goal())
 
         self.mission = 'Reach the goal'
-
-    def step(self, action):
-        obs, reward, done, info = MiniGridEnv.step(self, action)
-        return obs, reward, done, info
-
-register(
-    id='MiniGrid-FourRooms-v0',
-    entry_point='gym_minigrid.envs:FourRoomsEnv'
-)
@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class LavaGapEnv(MiniGridEnv):
     """
@@ -63,18 +62,3 @@ class LavaGapS6Env(LavaGapEnv):
 class LavaGapS7Env(LavaGapEnv):
     def __init__(self):
         super().__init__(size=7)
-
-register(
-    id='MiniGrid-LavaGapS5-v0',
-    entry_point='gym_minigrid.envs:LavaGapS5Env'
-)
-
-register(
-    id='MiniGrid-LavaGapS6-v0',
-    entry_point='gym_minigrid.envs:LavaGapS6Env'
-)
-
-register(
-    id='MiniGrid-LavaGapS7-v0',
-    entry_point='gym_minigrid.envs:LavaGapS7Env'
-)
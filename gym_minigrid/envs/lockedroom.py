@@ -1,6 +1,5 @@
 from gym import spaces
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class Room:
     def __init__(self,
@@ -113,12 +112,3 @@ class LockedRoom(MiniGridEnv):
             'unlock the %s door and '
             'go to the goal'
         ) % (lockedRoom.color, keyRoom.color, lockedRoom.color)
-
-    def step(self, action):
-        obs, reward, done, info = MiniGridEnv.step(self, action)
-        return obs, reward, done, info
-
-register(
-    id='MiniGrid-LockedRoom-v0',
-    entry_point='gym_minigrid.envs:LockedRoom'
-)
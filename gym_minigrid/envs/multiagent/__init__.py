@@ -0,0 +1,6 @@
+# RLlib is only needed to train on the multi-agent environments with it, so
+# it is imported here rather than by gym_minigrid.minigrid, and is optional
+try:
+    from ray.rllib.env import MultiAgentEnv
+except ImportError:
+    MultiAgentEnv = object
@@ -1,7 +1,7 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
+from gym_minigrid.envs.multiagent import MultiAgentEnv
 
-class MACircEnv(MiniGridEnv):
+class MACircEnv(MiniGridEnv, MultiAgentEnv):
     """
     Empty grid environment, no obstacles, sparse reward
     """
@@ -43,8 +43,3 @@ class MACircEnv(MiniGridEnv):
 
     def dense_reward_fn(self, rewards):
         return {agent_id: 0 for agent_id in rewards}
-
-register(
-    id='MiniGrid-MA-Circ-8x8-v0',
-    entry_point='gym_minigrid.envs.multiagent.ma_circ:MACircEnv'
-)
\ No newline at end of file
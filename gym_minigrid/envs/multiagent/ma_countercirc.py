@@ -1,7 +1,7 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
+from gym_minigrid.envs.multiagent import MultiAgentEnv
 
-class MACounterCirc(MiniGridEnv):
+class MACounterCirc(MiniGridEnv, MultiAgentEnv):
     """
     Empty grid environment, no obstacles, sparse reward
     """
@@ -109,8 +109,3 @@ class MACounterCirc(MiniGridEnv):
             dense_rewards['agent_2'] *= self.scaling
 
         return dense_rewards
-
-register(
-    id='MiniGrid-MA-MACounterCirc-v0',
-    entry_point='gym_minigrid.envs.multiagent.ma_countercirc:MACounterCirc'
-)
\ No newline at end of file
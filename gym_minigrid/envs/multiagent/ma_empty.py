@@ -1,7 +1,7 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
+from gym_minigrid.envs.multiagent import MultiAgentEnv
 
-class MAEmptyEnv(MiniGridEnv):
+class MAEmptyEnv(MiniGridEnv, MultiAgentEnv):
     """
     Empty grid environment, no obstacles, sparse reward
     """
@@ -22,7 +22,7 @@ class MAEmptyEnv(MiniGridEnv):
             # Set this to True for maximum speed
             see_through_walls=True,
             multiagent=True,
-            agent_ids=['agent_1', 'agent_2']
+            agent_ids=['agent_%d' % (i + 1) for i in range(num_agents)]
         )
 
     def _gen_grid(self, width, height):
@@ -37,17 +37,26 @@ class MAEmptyEnv(MiniGridEnv):
 
         self.put_obj(Goal(agent_id='agent_2'), 1, 1)
 
+        # Place the goals of any other agents randomly
+        for agent_id in self.agent_ids[2:]:
+            self.place_obj(Goal(agent_id=agent_id))
+
         for i, agent_id in enumerate(self.agent_ids):
             # Place the agent
             if self.agent_start_poses is not None:
                 self.agents[agent_id].pos = self.agent_start_poses[i]
                 self.agents[agent_id].dir = self.agent_start_dirs[i]
             else:
-                self.place_agent(agent_id)
+                self.place_agent(agent_id=agent_id)
 
         self.mission = "get to the green goal square"
 
-register(
-    id='MiniGrid-MA-Empty-8x8-v0',
-    entry_point='gym_minigrid.envs.multiagent.ma_empty:MAEmptyEnv'
-)
\ No newline at end of file
+
+class MAEmptyCrowdEnv32x32(MAEmptyEnv):
+    def __init__(self):
+        super().__init__(
+            size=32,
+            agent_start_poses=None,
+            agent_start_dirs=None,
+            num_agents=50
+        )
@@ -1,6 +1,5 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
-from ray.rllib.env import MultiAgentEnv
+from gym_minigrid.envs.multiagent import MultiAgentEnv
 
 
 class MultidoorCounter(MiniGridEnv, MultiAgentEnv):
@@ -93,22 +92,3 @@ class MultidoorCounter6x11(MultidoorCounter):
 class MultidoorCounter6x11Random(MultidoorCounter):
     def __init__(self):
         super().__init__(height=6, width=11, max_steps=30, randomize_key_pos=True)
-
-
-register(
-    id='MiniGrid-MA-MultidoorCounter-5x11-v0',
-    entry_point='gym_minigrid.envs:MultidoorCounter5x11',
-    reward_threshold=None
-)
-
-register(
-    id='MiniGrid-MA-MultidoorCounter-6x11-v0',
-    entry_point='gym_minigrid.envs:MultidoorCounter6x11',
-    reward_threshold=None
-)
-
-register(
-    id='MiniGrid-MA-MultidoorCounter-Random-6x11-v0',
-    entry_point='gym_minigrid.envs:MultidoorCounter6x11Random',
-    reward_threshold=None
-)
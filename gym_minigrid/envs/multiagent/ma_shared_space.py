@@ -1,6 +1,5 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
-from ray.rllib.env import MultiAgentEnv
+from gym_minigrid.envs.multiagent import MultiAgentEnv
 
 
 class SharedSpace(MiniGridEnv, MultiAgentEnv):
@@ -102,22 +101,3 @@ class SharedSpace6x8(SharedSpace):
 class SharedSpace6x11Random(SharedSpace):
     def __init__(self):
         super().__init__(height=6, width=11, max_steps=30, randomize_key_pos=True)
-
-
-register(
-    id='MiniGrid-MA-SharedSpace-7x7-v0',
-    entry_point='gym_minigrid.envs:SharedSpace7x7',
-    reward_threshold=None
-)
-
-register(
-    id='MiniGrid-MA-SharedSpace-6x11-v0',
-    entry_point='gym_minigrid.envs:SharedSpace6x11',
-    reward_threshold=None
-)
-
-register(
-    id='MiniGrid-MA-SharedSpace-Random-6x11-v0',
-    entry_point='gym_minigrid.envs:SharedSpace6x11Random',
-    reward_threshold=None
-)
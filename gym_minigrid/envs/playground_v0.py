@@ -1,5 +1,4 @@
 from gym_minigrid.minigrid import *
-from gym_minigrid.register import register
 
 class PlaygroundV0(MiniGridEnv):
     """
@@ -65,12 +64,3 @@ class PlaygroundV0(MiniGridEnv):
 
         # No explicit mission in this environment
         self.mission = ''
-
-    def step(self, action):
-        obs, reward, done, info = MiniGridEnv.step(self, action)
-        return obs, reward, done, info
-
-register(
-    id='MiniGrid-Playground-v0',
-    entry_point='gym_minigrid.envs:PlaygroundV0'
-)
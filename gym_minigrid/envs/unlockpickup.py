@@ -1,7 +1,6 @@
 from gym_minigrid.minigrid import *
 from gym_minigrid.minigrid import Ball
 from gym_minigrid.roomgrid import RoomGrid
-from gym_minigrid.register import register
 
 
 class UnlockPickup(RoomGrid):
@@ -43,9 +42,3 @@ class UnlockPickup(RoomGrid):
                 done = True
 
         return obs, reward, done, info
-
-
-register(
-    id='MiniGrid-UnlockPickup-v0',
-    entry_point='gym_minigrid.envs:UnlockPickup'
-)
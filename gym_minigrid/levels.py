@@ -0,0 +1,577 @@
+import os
+import sys
+import json
+import zlib
+import queue
+import hashlib
+import itertools
+import threading
+import numpy as np
+import gym
+from .minigrid import Grid, WorldObj, Wall, OBJECT_TO_IDX, IDX_TO_COLOR, DEFAULT_AGENT_ID
+
+# Version of the format of level snapshots, to be increased whenever
+# snapshot_level() changes, so that cached levels are invalidated
+LEVEL_FORMAT_VERSION = 4
+
+# Header of level snapshots, followed by the grid encoding, the keys of the
+# state of the RNG and the JSON tree of the other attributes of the level
+LEVEL_HEADER_DTYPE = np.dtype([
+    ('width', '<i8'),
+    ('height', '<i8'),
+    ('rng_keys', '<i8'),
+    ('state', '<i8'),
+])
+RNG_KEYS_DTYPE = np.dtype('<u4')
+
+# Types of the cells which hold no object, or a wall
+EMPTY_OR_WALL = [OBJECT_TO_IDX['empty'], OBJECT_TO_IDX['unseen'], OBJECT_TO_IDX['wall']]
+
+# Attributes which configure an environment rather than describe its
+# current level, and are left out of level snapshots, so that restoring a
+# level keeps the settings of the environment it is restored into (which
+# may differ from those of the generating one, e.g. under ViewSizeWrapper)
+CONFIG_ATTRS = frozenset([
+    'window',
+    'spec',
+    'np_random',
+    'actions',
+    'action_space',
+    'observation_space',
+    'reward_range',
+    'agents',
+    'occupancy',
+    'grid',
+    'width',
+    'height',
+    'max_steps',
+    'see_through_walls',
+    'agent_view_size',
+    'collision_penalty',
+    'multiagent',
+    'num_agents',
+    'agent_ids',
+    'should_render',
+    'legacy_placement',
+])
+
+
+def _class_name(cls):
+    return cls.__module__ + ':' + cls.__qualname__
+
+
+def _snapshot_class(name):
+    """
+    Get a class named in a level snapshot. Only classes of the modules of
+    gym_minigrid already imported can be named, and no code is run to
+    create their instances, so that loading a snapshot is safe.
+    """
+
+    module, _, qualname = name.partition(':')
+    assert module.split('.')[0] == 'gym_minigrid' and module in sys.modules, \
+        'unexpected class in level snapshot: %s' % name
+    cls = sys.modules[module]
+    for attr in qualname.split('.'):
+        cls = getattr(cls, attr, None)
+    assert isinstance(cls, type) and not issubclass(cls, gym.Env), \
+        'unexpected class in level snapshot: %s' % name
+
+    return cls
+
+
+class _SnapshotWriter:
+    """
+    Encode the attributes of a level into a JSON tree. Objects of the grid
+    are stored by cell and rebuilt from the grid encoding, other objects are
+    stored along with their class, and both are referred to by their index
+    in a table of objects, which preserves shared references and cycles
+    (e.g. between the rooms of a RoomGrid).
+    """
+
+    def __init__(self, grid):
+        self.cells = {id(obj): int(k) for k, obj in grid._objs.items()}
+        self.refs = {}
+        self.objects = []
+
+    def ref(self, obj):
+        idx = self.refs.get(id(obj))
+        if idx is None:
+            idx = self.refs[id(obj)] = len(self.objects)
+            entry = {}
+            self.objects.append(entry)
+
+            cell = self.cells.get(id(obj))
+            if cell is not None:
+                entry['cell'] = cell
+            else:
+                entry['class'] = _class_name(type(obj))
+                _snapshot_class(entry['class'])
+
+            # Walls are fully described by their encoding
+            if cell is None or type(obj) is not Wall:
+                entry['attrs'] = self.attrs(obj.__dict__)
+
+        return idx
+
+    def attrs(self, attrs):
+        return {name: self.value(value) for name, value in attrs.items()}
+
+    def value(self, value):
+        if value is None or type(value) in (bool, int, float, str):
+            return value
+        if isinstance(value, np.generic):
+            return {'scalar': [value.dtype.str, value.item()]}
+        if isinstance(value, np.ndarray):
+            assert value.dtype.kind in 'biuf', 'cannot snapshot %s arrays' % value.dtype
+            return {'array': [value.dtype.str, list(value.shape), value.ravel().tolist()]}
+        if type(value) is tuple:
+            return {'tuple': [self.value(v) for v in value]}
+        if type(value) is list:
+            return [self.value(v) for v in value]
+        if type(value) is dict:
+            return {'dict': [[self.value(k), self.value(v)] for k, v in value.items()]}
+        if isinstance(value, type):
+            _snapshot_class(_class_name(value))
+            return {'class': _class_name(value)}
+        return {'ref': self.ref(value)}
+
+
+class _SnapshotReader:
+    """
+    Decode the attributes of a level encoded by a _SnapshotWriter
+    """
+
+    def __init__(self, grid, entries):
+        # Create the objects first, and set their attributes once they
+        # all exist, as they may refer to each other
+        self.objects = []
+        for entry in entries:
+            if 'cell' in entry:
+                obj = grid._objs[entry['cell']]
+            else:
+                cls = _snapshot_class(entry['class'])
+                obj = cls.__new__(cls)
+            self.objects.append(obj)
+
+        for obj, entry in zip(self.objects, entries):
+            if 'attrs' in entry:
+                # Set without going through __setattr__, as pickle does
+                obj.__dict__.update(self.attrs(entry['attrs']))
+
+    def attrs(self, attrs):
+        return {name: self.value(value) for name, value in attrs.items()}
+
+    def value(self, value):
+        if type(value) is list:
+            return [self.value(v) for v in value]
+        if type(value) is not dict:
+            return value
+
+        (tag, data), = value.items()
+        if tag == 'ref':
+            return self.objects[data]
+        if tag == 'tuple':
+            return tuple(self.value(v) for v in data)
+        if tag == 'dict':
+            return {self.value(k): self.value(v) for k, v in data}
+        if tag == 'class':
+            return _snapshot_class(data)
+
+        dtype = np.dtype(data[0])
+        assert dtype.kind in 'biuf', 'unexpected dtype in level snapshot: %s' % dtype
+        if tag == 'scalar':
+            return dtype.type(data[1])
+        if tag == 'array':
+            return np.array(data[2], dtype=dtype).reshape(data[1])
+
+        assert False, 'unexpected value in level snapshot: %s' % tag
+
+
+def snapshot_level(env):
+    """
+    Take a compact snapshot of the current level of an environment, as
+    bytes holding the encoding of the grid, the state of the RNG, and a
+    JSON tree of the attributes of the objects in the grid other than walls,
+    of the agents and of the environment describing the level. The snapshot
+    can be restored into any instance of the same environment with
+    restore_level(). It is read without pickle, so that reading a snapshot
+    never runs code from it.
+    """
+
+    env = env.unwrapped
+    grid = env.grid
+
+    writer = _SnapshotWriter(grid)
+    for obj in grid._objs.values():
+        if type(obj) is not Wall:
+            writer.ref(obj)
+    _, rng_keys, rng_pos, has_gauss, cached_gaussian = env.np_random.get_state()
+    state = {
+        'agents': {
+            agent_id: writer.attrs({k: v for k, v in agent.__dict__.items() if k != 'occupancy'})
+            for agent_id, agent in env.agents.items()
+        },
+        'env': writer.attrs({k: v for k, v in env.__dict__.items() if k not in CONFIG_ATTRS}),
+        'rng': [int(rng_pos), int(has_gauss), float(cached_gaussian)],
+    }
+    state['objects'] = writer.objects
+
+    encoding = grid.encoding
+    rng_keys = rng_keys.astype(RNG_KEYS_DTYPE)
+    state = json.dumps(state).encode()
+    header = np.array(
+        (encoding.shape[0], encoding.shape[1], rng_keys.size, len(state)),
+        dtype=LEVEL_HEADER_DTYPE
+    )
+
+    return b''.join([header.tobytes(), encoding.tobytes(), rng_keys.tobytes(), state])
+
+
+def restore_level(env, level):
+    """
+    Restore a level snapshot taken with snapshot_level(), and return the
+    first observation of the episode, as reset() does
+    """
+
+    env = env.unwrapped
+
+    header = np.frombuffer(level, dtype=LEVEL_HEADER_DTYPE, count=1)[0]
+    width, height = int(header['width']), int(header['height'])
+    offset = LEVEL_HEADER_DTYPE.itemsize
+    encoding = np.frombuffer(level, dtype=np.uint8, count=width * height * 3, offset=offset)
+    encoding = encoding.reshape(width, height, 3)
+    offset += encoding.nbytes
+    rng_keys = np.frombuffer(level, dtype=RNG_KEYS_DTYPE, count=int(header['rng_keys']), offset=offset)
+    offset += rng_keys.nbytes
+    assert len(level) == offset + header['state'], 'truncated level snapshot'
+    state = json.loads(level[offset:].decode())
+
+    grid = Grid(width, height)
+    grid._encoding[...] = encoding
+
+    # Rebuild the objects from the encoding, walls are fully described by
+    # it and the attributes of the others are restored from the snapshot
+    objs = {}
+    xs, ys = np.nonzero(encoding[:, :, 0] == OBJECT_TO_IDX['wall'])
+    keys = (ys * width + xs).tolist()
+    colors = encoding[xs, ys, 1].tolist()
+    for k, color in zip(keys, colors):
+        objs[k] = Wall(IDX_TO_COLOR[color])
+    xs, ys = np.nonzero(~np.isin(encoding[:, :, 0], EMPTY_OR_WALL))
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        objs[y * width + x] = WorldObj.decode(*encoding[x, y].tolist())
+    grid._objs = objs
+    grid._stateful = {k: v for k, v in objs.items() if v.stateful}
+
+    reader = _SnapshotReader(grid, state['objects'])
+    env.__dict__.update(reader.attrs(state['env']))
+    env.grid = grid
+    for agent_id, attrs in state['agents'].items():
+        env.agents[agent_id].__dict__.update(reader.attrs(attrs))
+    env.update_occupancy()
+    env.np_random.set_state(('MT19937', rng_keys) + tuple(state['rng']))
+
+    if env.multiagent:
+        return env.gen_obs_batch()[1]
+    else:
+        return env.gen_obs(DEFAULT_AGENT_ID)
+
+
+def generate_level(env, seed):
+    """
+    Generate the level of an environment for a given seed, and return a
+    snapshot of it
+    """
+
+    env.seed(seed)
+    env.reset()
+
+    return snapshot_level(env)
+
+
+def _generate_levels(env_id, legacy_placement, seed, levels, stop):
+    """
+    Generate the levels of consecutive seeds into a queue, until stopped
+    """
+
+    env = gym.make(env_id)
+    env.unwrapped.legacy_placement = legacy_placement
+
+    for seed in itertools.count(seed):
+        level = generate_level(env, seed)
+        while not stop.is_set():
+            try:
+                levels.put((seed, level), timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        else:
+            break
+
+    # Don't wait for queued levels to be consumed before exiting
+    if hasattr(levels, 'cancel_join_thread'):
+        levels.cancel_join_thread()
+
+
+class LevelPool(gym.core.Wrapper):
+    """
+    Wrapper resetting an environment to levels pre-generated in the
+    background, by a thread (or a process) generating the levels of
+    consecutive seeds starting from a given one, and keeping up to size of
+    them ready. Each level is identical to the one obtained by seeding the
+    environment with its seed and resetting it, and the seed of the current
+    level is available as level_seed.
+    """
+
+    def __init__(self, env, size=64, seed=0, process=False):
+        super().__init__(env)
+        assert env is env.unwrapped, 'the level pool must directly wrap the environment'
+        assert env.spec is not None, 'the environment must be created with gym.make'
+
+        if process:
+            import multiprocessing
+            self.levels = multiprocessing.Queue(size)
+            self.stop = multiprocessing.Event()
+            worker_cls = multiprocessing.Process
+        else:
+            self.levels = queue.Queue(size)
+            self.stop = threading.Event()
+            worker_cls = threading.Thread
+
+        self.worker = worker_cls(
+            target=_generate_levels,
+            args=(env.spec.id, env.legacy_placement, seed, self.levels, self.stop),
+            daemon=True
+        )
+        self.worker.start()
+
+        self.level_seed = None
+
+    def reset(self, **kwargs):
+        self.level_seed, level = self.levels.get()
+        return restore_level(self.env, level)
+
+    def close(self):
+        if self.worker is not None:
+            self.stop.set()
+            self.worker.join(timeout=1)
+            if hasattr(self.worker, 'terminate') and self.worker.is_alive():
+                self.worker.terminate()
+            self.worker = None
+
+        return self.env.close()
+
+
+# Index entry of a cached level: its seed, and the position and size of its
+# compressed snapshot in the levels file
+INDEX_DTYPE = np.dtype([
+    ('seed', np.int64),
+    ('offset', np.int64),
+    ('length', np.int64),
+])
+
+# Generator version of each environment class
+_generator_versions = {}
+
+
+def generator_version(env_cls):
+    """
+    Version of the level generator of an environment class, as a hash of the
+    source files of the modules defining the class and its bases, so that
+    any change to the code which may generate levels changes the version
+    """
+
+    version = _generator_versions.get(env_cls)
+    if version is None:
+        h = hashlib.sha1(b'%d' % LEVEL_FORMAT_VERSION)
+        paths = []
+        for cls in env_cls.__mro__:
+            path = getattr(sys.modules.get(cls.__module__), '__file__', None)
+            if path is not None and path not in paths:
+                paths.append(path)
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+        version = _generator_versions[env_cls] = h.hexdigest()
+
+    return version
+
+
+class _LevelTable:
+    """
+    Levels cached for one environment configuration, stored as compressed
+    snapshots appended to a file, along with an index of their seeds. The
+    index is only read when the table is first accessed, and each snapshot
+    when its level is requested.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = None
+        self.file = None
+
+        # Levels added since the last flush
+        self.pending = {}
+
+    def _load_index(self):
+        self.index = {}
+        index_path = os.path.join(self.path, 'index.npy')
+        if os.path.exists(index_path):
+            for seed, offset, length in np.load(index_path).tolist():
+                self.index[seed] = (offset, length)
+
+    def get(self, seed):
+        level = self.pending.get(seed)
+        if level is not None:
+            return level
+
+        if self.index is None:
+            self._load_index()
+        entry = self.index.get(seed)
+        if entry is None:
+            return None
+
+        if self.file is None:
+            self.file = open(os.path.join(self.path, 'levels.bin'), 'rb')
+        offset, length = entry
+        self.file.seek(offset)
+        return zlib.decompress(self.file.read(length))
+
+    def put(self, seed, level):
+        self.pending[seed] = level
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.index is None:
+            self._load_index()
+
+        with open(os.path.join(self.path, 'levels.bin'), 'ab') as f:
+            offset = f.tell()
+            for seed, level in self.pending.items():
+                data = zlib.compress(level)
+                f.write(data)
+                self.index[seed] = (offset, len(data))
+                offset += len(data)
+        self.pending = {}
+
+        index = np.array([(seed,) + entry for seed, entry in self.index.items()], dtype=INDEX_DTYPE)
+        index_path = os.path.join(self.path, 'index.npy')
+        np.save(index_path + '.tmp.npy', index)
+        os.replace(index_path + '.tmp.npy', index_path)
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LevelCache:
+    """
+    Cache of generated levels, keyed by environment class, constructor
+    kwargs and seed, and persisted to disk in a directory. Each environment
+    configuration gets a subdirectory named after a hash of the class, its
+    kwargs and the version of its generator, so that levels cached before a
+    change to the generator are never used. A cache directory should only
+    be written to by one process at a time. Levels are read without
+    pickle, so reading a cache never runs code stored in it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.tables = {}
+
+    def _table(self, env, kwargs):
+        env_cls = type(env.unwrapped)
+        if kwargs is None:
+            assert env.spec is not None, 'kwargs must be given for envs not created with gym.make'
+            kwargs = getattr(env.spec, 'kwargs', None) or env.spec._kwargs
+
+        config = (
+            env_cls.__module__ + '.' + env_cls.__qualname__,
+            sorted(kwargs.items()),
+            generator_version(env_cls),
+        )
+        if env.unwrapped.legacy_placement:
+            config += ('legacy_placement',)
+        key = '%s-%s' % (env_cls.__name__, hashlib.sha1(repr(config).encode()).hexdigest()[:16])
+
+        table = self.tables.get(key)
+        if table is None:
+            path = os.path.join(self.path, key)
+            if not os.path.exists(path):
+                os.makedirs(path)
+                with open(os.path.join(path, 'config.json'), 'w') as f:
+                    json.dump({
+                        'class': config[0],
+                        'kwargs': repr(config[1]),
+                        'version': config[2],
+                        'legacy_placement': env.unwrapped.legacy_placement,
+                    }, f)
+            table = self.tables[key] = _LevelTable(path)
+
+        return table
+
+    def get(self, env, seed, kwargs=None):
+        """
+        Get the snapshot of a cached level, or None if not cached
+        """
+
+        return self._table(env, kwargs).get(seed)
+
+    def reset(self, env, seed, kwargs=None):
+        """
+        Reset an environment to the level generated with a given seed,
+        generating and caching it if needed
+        """
+
+        table = self._table(env, kwargs)
+        level = table.get(seed)
+        if level is None:
+            level = generate_level(env, seed)
+            table.put(seed, level)
+
+        return restore_level(env, level)
+
+    def flush(self):
+        """
+        Write the levels added to the cache to disk
+        """
+
+        for table in self.tables.values():
+            table.flush()
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+
+
+class CachedLevels(gym.core.Wrapper):
+    """
+    Wrapper taking the levels of seeded resets from a LevelCache, so that
+    each level is only generated once. Resets which follow a call to
+    seed() use the cache, others generate a new level as usual. Wrap it
+    in a ReseedWrapper to evaluate on a fixed set of seeds.
+    """
+
+    def __init__(self, env, cache, kwargs=None):
+        super().__init__(env)
+        assert env is env.unwrapped, 'the level cache must directly wrap the environment'
+        self.cache = cache
+        self.kwargs = kwargs
+        self.next_seed = None
+
+    def seed(self, seed=None):
+        self.next_seed = seed
+        return self.env.seed(seed)
+
+    def reset(self, **kwargs):
+        seed, self.next_seed = self.next_seed, None
+        if seed is None:
+            return self.env.reset(**kwargs)
+        return self.cache.reset(self.env, seed, self.kwargs)
+
+    def close(self):
+        self.cache.flush()
+        return self.env.close()
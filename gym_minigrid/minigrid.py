@@ -4,7 +4,6 @@ from enum import IntEnum
 import numpy as np
 from gym import error, spaces, utils
 from gym.utils import seeding
-from ray.rllib.env import MultiAgentEnv
 from .rendering import *
 
 # Size in pixels of a tile in the full-scale human view
@@ -77,12 +76,52 @@ DIR_TO_VEC = [
     np.array((0, -1)),
 ]
 
+# Offsets of the cell in front of the agent for each direction, as tuples
+DIR_TO_OFFSET = [tuple(vec.tolist()) for vec in DIR_TO_VEC]
+
+
+def view_offsets(view_size):
+    """
+    Offsets from the agent position of the world cells covered by each cell
+    of its view, for each direction. Returns an array of shape
+    (4, 2, view_size, view_size), where view cell (i, j) is at the world
+    position agent_pos + offsets[dir, :, i, j].
+    """
+
+    vi, vj = np.meshgrid(np.arange(view_size), np.arange(view_size), indexing='ij')
+    offsets = np.zeros((4, 2, view_size, view_size), dtype=np.int64)
+
+    for agent_dir in range(4):
+        dx, dy = DIR_TO_VEC[agent_dir]
+        rx, ry = -dy, dx
+
+        # The agent is at the bottom-center of its view, facing up
+        forward = view_size - 1 - vj
+        right = vi - view_size // 2
+        offsets[agent_dir, 0] = dx * forward + rx * right
+        offsets[agent_dir, 1] = dy * forward + ry * right
+
+    return offsets
+
+
+# View offsets, by view size
+_view_offsets = {}
+
 
 class WorldObj:
     """
     Base class for grid world objects
     """
 
+    # Whether the encoding of this object can change after it is placed
+    # in a grid (e.g. a door being opened). The grid re-encodes these
+    # objects when its encoding is read, all others are encoded once.
+    stateful = False
+
+    # Number of attribute changes of stateful objects so far, so that
+    # grids only re-encode them after one of them changed
+    state_changes = 0
+
     def __init__(self, type, color):
         assert type in OBJECT_TO_IDX, type
         assert color in COLOR_TO_IDX, color
@@ -147,7 +186,7 @@ class WorldObj:
         elif obj_type == 'door':
             v = Door(color, is_open, is_locked)
         elif obj_type == 'goal':
-            v = Goal()
+            v = Goal(color=color)
         elif obj_type == 'lava':
             v = Lava()
         elif obj_type == 'counter':
@@ -195,17 +234,19 @@ class Floor(WorldObj):
     def can_overlap(self):
         return True
 
-    def render(self, r):
+    def render(self, img):
         # Give the floor a pale color
-        c = COLORS[self.color]
-        r.setLineColor(100, 100, 100, 0)
-        r.setColor(*c/2)
-        r.drawPolygon([
-            (1, TILE_PIXELS),
-            (TILE_PIXELS, TILE_PIXELS),
-            (TILE_PIXELS,           1),
-            (1,           1)
-        ])
+        color = COLORS[self.color] / 2
+        fill_coords(img, point_in_rect(0.031, 1, 0.031, 1), color)
+
+
+def _set_state_attr(self, name, value):
+    """
+    Set an attribute of a stateful object, counting the change
+    """
+
+    WorldObj.state_changes += 1
+    object.__setattr__(self, name, value)
 
 
 class Counter(WorldObj):
@@ -213,6 +254,9 @@ class Counter(WorldObj):
     Counter. Can't walk over, but can place items on
     """
 
+    stateful = True
+    __setattr__ = _set_state_attr
+
     def __init__(self, obj=None, color='tan'):
         super().__init__('counter', color)
         self.obj = obj
@@ -288,6 +332,9 @@ class Wall(WorldObj):
 
 
 class Door(WorldObj):
+    stateful = True
+    __setattr__ = _set_state_attr
+
     def __init__(self, color, is_open=False, is_locked=False):
         super().__init__('door', color)
         self.is_open = is_open
@@ -407,13 +454,465 @@ class Box(WorldObj):
         return True
 
 
+def decoded_encoding_table():
+    """
+    Encoding of the object decoded from every possible (type, color, state)
+    cell encoding, indexed by type, color and state. Decoding normalizes
+    some encodings (e.g. the color of lava), so this gives the encoding of
+    the tile a decoded observation is rendered with.
+    """
+
+    table = np.zeros((len(OBJECT_TO_IDX), len(COLOR_TO_IDX), len(STATE_TO_IDX), 3), dtype='uint8')
+    for type_idx in range(len(OBJECT_TO_IDX)):
+        for color_idx in range(len(COLOR_TO_IDX)):
+            for state in range(len(STATE_TO_IDX)):
+                # Agents can't be decoded, leave their encoding as is
+                if IDX_TO_OBJECT[type_idx] == 'agent':
+                    table[type_idx, color_idx, state] = (type_idx, color_idx, state)
+                    continue
+                obj = WorldObj.decode(type_idx, color_idx, state)
+                table[type_idx, color_idx, state] = obj.encode() if obj else (OBJECT_TO_IDX['empty'], 0, 0)
+
+    return table
+
+
+class TileAtlas:
+    """
+    Atlas of pre-rendered tiles of a given size
+
+    Tiles are stored in a single (num_tiles, tile_size, tile_size, 3) uint8
+    array and looked up by a packed integer key, built from the encoding of
+    the object in the cell, the direction and color of the agent standing
+    on it and whether the cell is highlighted. A tile is rasterized the
+    first time its key is looked up, or ahead of time with precompute().
+
+    The memory used by the atlas can be bounded with max_bytes, in which
+    case the least recently used tiles are evicted once it is full. A warm
+    atlas can be saved to and loaded from an .npz file, or shared read-only
+    with other processes through shared memory.
+    """
+
+    # Number of values of each field of a tile key, from the least to the
+    # most significant. Agent directions and colors are offset by one, so
+    # that zero means there is no agent in the cell.
+    KEY_FIELDS = (
+        len(OBJECT_TO_IDX),
+        len(COLOR_TO_IDX),
+        len(STATE_TO_IDX),
+        len(DIR_TO_VEC) + 1,
+        len(COLOR_TO_IDX) + 1,
+        2
+    )
+
+    NUM_KEYS = int(np.prod(KEY_FIELDS))
+
+    # Maximum size of the tiles gathered at once when rendering
+    GATHER_BYTES = 1 << 16
+
+    # Default bound on the memory used by the tiles of each atlas, in bytes
+    max_bytes = None
+
+    def __init__(self, tile_size=TILE_PIXELS, subdivs=3, max_bytes=None):
+        self.tile_size = tile_size
+        self.subdivs = subdivs
+
+        tile_bytes = tile_size * tile_size * 3
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        self.max_bytes = max_bytes
+        self.max_tiles = None if max_bytes is None else max(1, max_bytes // tile_bytes)
+
+        # Index of the tile of each key in the atlas, -1 if not rendered yet
+        self.slots = np.full(self.NUM_KEYS, -1, dtype=np.int32)
+
+        # Rendered tiles, the first num_tiles entries are in use, along
+        # with the key of each tile and the last lookup which used it
+        self.tiles = np.zeros((0, tile_size, tile_size, 3), dtype=np.uint8)
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.last_used = np.zeros(0, dtype=np.int64)
+        self.num_tiles = 0
+
+        # Statistics, counted in tiles looked up
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Shared memory block the tiles are stored in, if attached to one
+        self.shm = None
+
+    @property
+    def nbytes(self):
+        """
+        Number of bytes used by the tiles stored in the atlas
+        """
+
+        return self.num_tiles * self.tile_size * self.tile_size * 3
+
+    def stats(self):
+        """
+        Get the lookup statistics and memory use of the atlas
+        """
+
+        return {
+            'tiles': self.num_tiles,
+            'bytes': self.nbytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    @classmethod
+    def pack_key(cls, encoding, agent_dir=-1, agent_color=-1, highlight=False):
+        """
+        Pack the description of one or more tiles into integer keys.
+        The arguments are scalars or arrays broadcastable together, the
+        object encoding having an extra trailing dimension of size 3.
+        An agent direction and color of -1 mean there is no agent.
+        """
+
+        encoding = np.asarray(encoding, dtype=np.int64)
+        n_type, n_color, n_state, n_dir, n_agent, _ = cls.KEY_FIELDS
+
+        key = np.asarray(highlight, dtype=np.int64)
+        key = key * n_agent + np.asarray(agent_color) + 1
+        key = key * n_dir + np.asarray(agent_dir) + 1
+        key = key * n_state + encoding[..., 2]
+        key = key * n_color + encoding[..., 1]
+        key = key * n_type + encoding[..., 0]
+
+        return key
+
+    @classmethod
+    def unpack_key(cls, key):
+        """
+        Unpack an integer key into the tile description it was built from
+        """
+
+        fields = []
+        key = int(key)
+        for size in cls.KEY_FIELDS:
+            key, value = divmod(key, size)
+            fields.append(value)
+
+        type_idx, color_idx, state, agent_dir, agent_color, highlight = fields
+
+        return (type_idx, color_idx, state), agent_dir - 1, agent_color - 1, bool(highlight)
+
+    def lookup(self, keys):
+        """
+        Get the indices in the atlas of the tiles for an array of keys,
+        rendering the tiles which are not in the atlas yet
+        """
+
+        keys = np.asarray(keys)
+        slots = self.slots[keys]
+
+        missing = slots < 0
+        num_missing = np.count_nonzero(missing)
+        self.hits += slots.size - num_missing
+        self.misses += num_missing
+
+        # Mark the tiles as used, so they are not evicted while rendering
+        # the missing ones
+        self.clock += 1
+        if self.max_tiles is not None:
+            self.last_used[slots[~missing]] = self.clock
+
+        if num_missing:
+            for key in np.unique(keys[missing]):
+                self.add(key)
+            slots = self.slots[keys]
+
+        return slots
+
+    def add(self, key):
+        """
+        Render the tile for a key and add it to the atlas
+        """
+
+        if self.max_tiles is None or self.num_tiles < self.max_tiles:
+            if self.num_tiles == len(self.tiles):
+                capacity = max(16, 2 * len(self.tiles))
+                if self.max_tiles is not None:
+                    capacity = min(capacity, self.max_tiles)
+                self._resize(capacity)
+            slot = self.num_tiles
+            self.num_tiles += 1
+        else:
+            # Evict the least recently used tile
+            slot = int(np.argmin(self.last_used[:self.num_tiles]))
+            assert self.last_used[slot] < self.clock, \
+                'tile atlas too small to render a single frame'
+            self.slots[self.keys[slot]] = -1
+            self.evictions += 1
+
+        # Tiles attached from shared memory are read-only, copy them
+        # before modifying the atlas
+        if not self.tiles.flags.writeable:
+            self._resize(len(self.tiles))
+
+        self.tiles[slot] = self.render_key(key)
+        self.keys[slot] = key
+        self.last_used[slot] = self.clock
+        self.slots[key] = slot
+
+        return slot
+
+    def _resize(self, capacity):
+        """
+        Move the tiles to newly allocated arrays with a given capacity
+        """
+
+        n = self.num_tiles
+        tiles = np.zeros((capacity,) + self.tiles.shape[1:], dtype=np.uint8)
+        keys = np.zeros(capacity, dtype=np.int64)
+        last_used = np.zeros(capacity, dtype=np.int64)
+        tiles[:n] = self.tiles[:n]
+        keys[:n] = self.keys[:n]
+        last_used[:n] = self.last_used[:n]
+
+        self.tiles = tiles
+        self.keys = keys
+        self.last_used = last_used
+
+    def _set_tiles(self, keys, tiles):
+        """
+        Use the given arrays of keys and rendered tiles as the atlas
+        contents, without copying them
+        """
+
+        if self.max_tiles is not None:
+            keys = keys[:self.max_tiles]
+            tiles = tiles[:self.max_tiles]
+
+        self.slots[:] = -1
+        self.slots[keys] = np.arange(len(keys))
+        self.tiles = tiles
+        self.keys = keys
+        self.last_used = np.zeros(len(keys), dtype=np.int64)
+        self.num_tiles = len(keys)
+
+    def save(self, path):
+        """
+        Save the rendered tiles to an .npz file
+        """
+
+        np.savez(
+            path,
+            key_fields=np.array(self.KEY_FIELDS),
+            tile_size=self.tile_size,
+            subdivs=self.subdivs,
+            keys=self.keys[:self.num_tiles],
+            tiles=self.tiles[:self.num_tiles]
+        )
+
+    @classmethod
+    def load(cls, path, max_bytes=None):
+        """
+        Load an atlas saved with save()
+        """
+
+        with np.load(path) as data:
+            assert tuple(data['key_fields']) == cls.KEY_FIELDS, \
+                'tile atlas saved with a different key layout'
+            atlas = cls(int(data['tile_size']), int(data['subdivs']), max_bytes)
+            atlas._set_tiles(data['keys'], data['tiles'])
+
+        return atlas
+
+    def share(self):
+        """
+        Copy the rendered tiles to a new shared memory block, which other
+        processes can attach to with TileAtlas.attach(shm.name). The caller
+        is responsible for closing and unlinking the returned block.
+        """
+
+        from multiprocessing import shared_memory
+
+        n = self.num_tiles
+        tile_shape = (self.tile_size, self.tile_size, 3)
+        header = np.array([self.NUM_KEYS, self.tile_size, self.subdivs, n], dtype=np.int64)
+        size = header.nbytes + n * (8 + int(np.prod(tile_shape)))
+
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        header_, keys, tiles = self._shared_arrays(shm, n, tile_shape)
+        header_[:] = header
+        keys[:] = self.keys[:n]
+        tiles[:] = self.tiles[:n]
+
+        return shm
+
+    @classmethod
+    def attach(cls, name, max_bytes=None):
+        """
+        Attach to an atlas shared by another process. The shared tiles are
+        read-only, and are only copied if new tiles need to be rendered.
+        The block stays owned by the process which shared it.
+        """
+
+        from multiprocessing import resource_tracker, shared_memory
+
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13, attaching registers the block with the
+            # resource tracker of this process, which unlinks it when the
+            # process exits, even though other processes still use it.
+            # Unregistering it afterwards would drop the registration of
+            # the sharing process when both use the same tracker.
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        num_keys, tile_size, subdivs, n = np.ndarray(4, dtype=np.int64, buffer=shm.buf)
+        assert num_keys == cls.NUM_KEYS, 'tile atlas shared with a different key layout'
+
+        atlas = cls(int(tile_size), int(subdivs), max_bytes)
+        _, keys, tiles = cls._shared_arrays(shm, int(n), (tile_size, tile_size, 3))
+        keys.flags.writeable = False
+        tiles.flags.writeable = False
+        atlas._set_tiles(keys, tiles)
+        atlas.shm = shm
+
+        return atlas
+
+    @staticmethod
+    def _shared_arrays(shm, n, tile_shape):
+        """
+        Get the header, key and tile arrays stored in a shared memory block
+        """
+
+        header = np.ndarray(4, dtype=np.int64, buffer=shm.buf)
+        keys = np.ndarray(n, dtype=np.int64, buffer=shm.buf, offset=header.nbytes)
+        tiles = np.ndarray(
+            (n,) + tuple(tile_shape),
+            dtype=np.uint8,
+            buffer=shm.buf,
+            offset=header.nbytes + keys.nbytes
+        )
+
+        return header, keys, tiles
+
+    def render_key(self, key):
+        """
+        Rasterize the tile described by a key
+        """
+
+        encoding, agent_dir, agent_color, highlight = self.unpack_key(key)
+        obj = WorldObj.decode(*encoding)
+
+        size = self.tile_size * self.subdivs
+        img = np.zeros(shape=(size, size, 3), dtype=np.uint8)
+
+        # Draw the grid lines (top and left edges)
+        fill_coords(img, point_in_rect(0, 0.031, 0, 1), (100, 100, 100))
+        fill_coords(img, point_in_rect(0, 1, 0, 0.031), (100, 100, 100))
+
+        if obj != None:
+            obj.render(img)
+
+        # Overlay the agent on top
+        if agent_dir >= 0:
+            tri_fn = point_in_triangle(
+                (0.12, 0.19),
+                (0.87, 0.50),
+                (0.12, 0.81),
+            )
+
+            # Rotate the agent based on its direction
+            tri_fn = rotate_fn(tri_fn, cx=0.5, cy=0.5, theta=0.5*math.pi*agent_dir)
+            fill_coords(img, tri_fn, COLORS[IDX_TO_COLOR[agent_color]])
+
+        # Highlight the cell if needed
+        if highlight:
+            highlight_img(img)
+
+        # Downsample the image to perform supersampling/anti-aliasing
+        return downsample(img, self.subdivs).astype(np.uint8)
+
+    def render(self, keys, out=None):
+        """
+        Render a (width, height) array of tile keys into an image, or a
+        batch of them of shape (..., width, height) into stacked images,
+        optionally writing it into a preallocated output buffer
+        """
+
+        *batch, width, height = keys.shape
+        size = self.tile_size
+        shape = tuple(batch) + (height * size, width * size, 3)
+
+        if out is None:
+            out = np.empty(shape, dtype=np.uint8)
+        assert out.shape == shape
+        assert out.flags.c_contiguous
+
+        # Gather the tiles in (row, column) order, copying each of them
+        # to its block of the output image. Rows of tiles are gathered a
+        # few at a time, which avoids allocating a large temporary array.
+        # The rows of the images of a batch follow each other in memory,
+        # so they are gathered as the rows of a single image.
+        slots = self.lookup(np.swapaxes(keys, -1, -2)).reshape(-1, width)
+        blocks = out.reshape(-1, size, width, size, 3)
+        step = max(1, self.GATHER_BYTES // (width * self.tiles[0].nbytes))
+        for j in range(0, len(slots), step):
+            blocks[j:j+step] = self.tiles[slots[j:j+step]].transpose(0, 2, 1, 3, 4)
+
+        return out
+
+    def precompute(self, agent_colors=('red',)):
+        """
+        Render the tiles of every object which can appear in a grid, with
+        and without highlighting, and with agents of the given colors
+        """
+
+        encodings = [(OBJECT_TO_IDX['empty'], 0, 0)]
+        for obj_type, type_idx in OBJECT_TO_IDX.items():
+            if obj_type in ('unseen', 'empty', 'agent'):
+                continue
+            states = STATE_TO_IDX.values() if obj_type == 'door' else [0]
+            for color_idx in COLOR_TO_IDX.values():
+                for state in states:
+                    encodings.append((type_idx, color_idx, state))
+
+        agents = [(-1, -1)] + [(agent_dir, COLOR_TO_IDX[color])
+                               for color in agent_colors
+                               for agent_dir in range(len(DIR_TO_VEC))]
+        agents = np.array(agents)
+
+        keys = self.pack_key(
+            np.array(encodings)[:, None, None],
+            agents[None, :, None, 0],
+            agents[None, :, None, 1],
+            np.array([False, True])[None, None, :]
+        )
+        self.lookup(keys)
+
+        return self
+
+
+# Tile keys of the cells of agent observations, indexed by type, color and
+# state, and the offsets added to them when a cell is highlighted and when
+# it holds the agent. Keys are sums of their fields, which lets observations
+# be turned into keys with one lookup instead of packing each field.
+OBS_TILE_KEYS = TileAtlas.pack_key(decoded_encoding_table())
+OBS_HIGHLIGHT_KEY = int(TileAtlas.pack_key((0, 0, 0), highlight=True))
+OBS_AGENT_KEY = int(TileAtlas.pack_key((0, 0, 0), 3, COLOR_TO_IDX['red']))
+
+
 class Grid:
     """
     Represent a grid and operations on it
+
+    The contents of the grid are stored as a compact (width, height, 3)
+    uint8 encoding, along with a sparse table of the object instances
+    occupying non-empty cells, so that object identity is preserved.
     """
 
-    # Static cache of pre-renderer tiles
-    tile_cache = {}
+    # Static atlases of pre-rendered tiles, one per tile size
+    tile_atlases = {}
 
     def __init__(self, width, height):
         assert width >= 3
@@ -422,17 +921,45 @@ class Grid:
         self.width = width
         self.height = height
 
-        self.grid = [None] * width * height
+        # Compact encoding of every cell, empty cells by default
+        self._encoding = np.zeros((width, height, 3), dtype='uint8')
+        self._encoding[:, :, 0] = OBJECT_TO_IDX['empty']
+
+        # Objects occupying non-empty cells, keyed by flat cell index
+        self._objs = {}
+
+        # Subset of the above whose encoding may change after placement
+        self._stateful = {}
+
+        # Value of WorldObj.state_changes when the above were last encoded
+        self._synced = -1
+
+    @property
+    def grid(self):
+        """
+        List view of the objects in the grid, in row-major order
+        """
+
+        return [self._objs.get(k) for k in range(self.width * self.height)]
+
+    @property
+    def encoding(self):
+        """
+        Read-only view of the compact encoding of the grid
+        """
+
+        self._sync()
+        view = self._encoding.view()
+        view.flags.writeable = False
+        return view
 
     def __contains__(self, key):
         if isinstance(key, WorldObj):
-            for e in self.grid:
+            for e in self._objs.values():
                 if e is key:
                     return True
         elif isinstance(key, tuple):
-            for e in self.grid:
-                if e is None:
-                    continue
+            for e in self._objs.values():
                 if (e.color, e.type) == key:
                     return True
                 if key[0] is None and key[1] == e.type:
@@ -440,26 +967,95 @@ class Grid:
         return False
 
     def __eq__(self, other):
-        grid1 = self.encode()
-        grid2 = other.encode()
+        grid1 = self.encoding
+        grid2 = other.encoding
         return np.array_equal(grid2, grid1)
 
     def __ne__(self, other):
         return not self == other
 
     def copy(self):
-        from copy import deepcopy
-        return deepcopy(self)
+        """
+        Copy the grid, along with the objects it contains
+        """
+
+        from copy import copy, deepcopy
+
+        grid = Grid.__new__(Grid)
+        grid.width = self.width
+        grid.height = self.height
+        grid._encoding = self._encoding.copy()
+
+        # Walls don't refer to other objects and are copied shallowly.
+        # Other objects are copied with a shared memo, so that objects
+        # referred to from several places are only copied once.
+        memo = {}
+        grid._objs = {
+            k: copy(v) if type(v) is Wall else deepcopy(v, memo)
+            for k, v in self._objs.items()
+        }
+        grid._stateful = {k: grid._objs[k] for k in self._stateful}
+        grid._synced = -1
+
+        return grid
 
     def set(self, i, j, v):
         assert i >= 0 and i < self.width
         assert j >= 0 and j < self.height
-        self.grid[j * self.width + i] = v
+        k = j * self.width + i
+
+        if v is None:
+            self._objs.pop(k, None)
+            self._stateful.pop(k, None)
+            self._encoding[i, j] = (OBJECT_TO_IDX['empty'], 0, 0)
+            return
+
+        self._objs[k] = v
+        self._encoding[i, j] = v.encode()
+        if v.stateful:
+            self._stateful[k] = v
+        else:
+            self._stateful.pop(k, None)
 
     def get(self, i, j):
         assert i >= 0 and i < self.width
         assert j >= 0 and j < self.height
-        return self.grid[j * self.width + i]
+        return self._objs.get(j * self.width + i)
+
+    def move_objs(self, src, dst):
+        """
+        Move the objects at the positions in src to the positions in dst,
+        given as (N, 2) arrays. The destinations must be empty or left
+        by moved objects.
+        """
+
+        xs, ys = src[:, 0], src[:, 1]
+        src_keys = (ys * self.width + xs).tolist()
+        dst_keys = (dst[:, 1] * self.width + dst[:, 0]).tolist()
+
+        encoding = self._encoding[xs, ys]
+        self._encoding[xs, ys] = (OBJECT_TO_IDX['empty'], 0, 0)
+        self._encoding[dst[:, 0], dst[:, 1]] = encoding
+
+        objs = [self._objs.pop(k) for k in src_keys]
+        stateful = [self._stateful.pop(k, None) for k in src_keys]
+        for k, obj, v in zip(dst_keys, objs, stateful):
+            self._objs[k] = obj
+            if v is not None:
+                self._stateful[k] = v
+
+    def _sync(self):
+        """
+        Refresh the encoding of objects whose state may have changed,
+        if any stateful object changed since the last refresh
+        """
+
+        if self._synced == WorldObj.state_changes:
+            return
+
+        for k, v in self._stateful.items():
+            self._encoding[k % self.width, k // self.width] = v.encode()
+        self._synced = WorldObj.state_changes
 
     def horz_wall(self, x, y, length=None, obj_type=Wall):
         if length is None:
@@ -486,19 +1082,43 @@ class Grid:
 
         grid = Grid(self.height, self.width)
 
-        for i in range(self.width):
-            for j in range(self.height):
-                v = self.get(i, j)
-                grid.set(j, grid.height - 1 - i, v)
+        # Cell (i, j) moves to (j, width - 1 - i)
+        self._sync()
+        grid._encoding = np.ascontiguousarray(np.rot90(self._encoding, k=-1))
+
+        for k, v in self._objs.items():
+            i, j = k % self.width, k // self.width
+            k2 = (self.width - 1 - i) * grid.width + j
+            grid._objs[k2] = v
+            if v.stateful:
+                grid._stateful[k2] = v
 
         return grid
 
+    def slice_encoding(self, topX, topY, width, height):
+        """
+        Get the encoding of a subset of the grid, without building a
+        new grid. Cells outside of the grid are encoded as walls.
+        """
+
+        array = np.empty((width, height, 3), dtype='uint8')
+        array[:, :] = Wall().encode()
+
+        x0, x1 = max(topX, 0), min(topX + width, self.width)
+        y0, y1 = max(topY, 0), min(topY + height, self.height)
+        if x0 < x1 and y0 < y1:
+            self._sync()
+            array[x0-topX:x1-topX, y0-topY:y1-topY] = self._encoding[x0:x1, y0:y1]
+
+        return array
+
     def slice(self, topX, topY, width, height):
         """
         Get a subset of the grid
         """
 
         grid = Grid(width, height)
+        grid._encoding = self.slice_encoding(topX, topY, width, height)
 
         for j in range(0, height):
             for i in range(0, width):
@@ -507,14 +1127,41 @@ class Grid:
 
                 if x >= 0 and x < self.width and \
                    y >= 0 and y < self.height:
-                    v = self.get(x, y)
+                    v = self._objs.get(y * self.width + x)
+                    if v is None:
+                        continue
                 else:
                     v = Wall()
 
-                grid.set(i, j, v)
+                k = j * width + i
+                grid._objs[k] = v
+                if v.stateful:
+                    grid._stateful[k] = v
 
         return grid
 
+    @classmethod
+    def get_atlas(cls, tile_size=TILE_PIXELS, subdivs=3):
+        """
+        Get the shared atlas of rendered tiles for a given tile size
+        """
+
+        key = (tile_size, subdivs)
+        atlas = cls.tile_atlases.get(key)
+        if atlas is None:
+            atlas = cls.tile_atlases[key] = TileAtlas(tile_size, subdivs)
+
+        return atlas
+
+    @classmethod
+    def use_atlas(cls, atlas):
+        """
+        Render tiles of the size of the given atlas with it, e.g. an atlas
+        loaded from disk or attached from shared memory
+        """
+
+        cls.tile_atlases[(atlas.tile_size, atlas.subdivs)] = atlas
+
     @classmethod
     def render_tile(
         cls,
@@ -523,51 +1170,57 @@ class Grid:
         highlight=False,
         tile_size=TILE_PIXELS,
         subdivs=3,
-        agent_color=None
+        agent_color='red'
     ):
         """
-        Render a tile and cache the result
+        Render a tile, looking it up in the tile atlas. The agent color is
+        a color name or the RGB value of one of the named colors.
         """
 
-        # Hash map lookup key for the cache
-        key = (agent_dir, agent_color, highlight, tile_size)
-        key = obj.encode() + key if obj else key
-
-        if key in cls.tile_cache:
-            return cls.tile_cache[key]
+        if agent_color is None:
+            agent_color = 'red'
+        elif not isinstance(agent_color, str):
+            rgb = tuple(agent_color)
+            names = [name for name in COLOR_NAMES if tuple(COLORS[name]) == rgb]
+            assert names, 'agent color %s is not one of the named colors' % (rgb,)
+            agent_color = names[0]
+
+        atlas = cls.get_atlas(tile_size, subdivs)
+        key = atlas.pack_key(
+            obj.encode() if obj else (OBJECT_TO_IDX['empty'], 0, 0),
+            -1 if agent_dir is None else agent_dir,
+            -1 if agent_dir is None else COLOR_TO_IDX[agent_color],
+            highlight
+        )
 
-        img = np.zeros(shape=(tile_size * subdivs, tile_size * subdivs, 3), dtype=np.uint8)
+        slot = atlas.lookup(key)
 
-        # Draw the grid lines (top and left edges)
-        fill_coords(img, point_in_rect(0, 0.031, 0, 1), (100, 100, 100))
-        fill_coords(img, point_in_rect(0, 1, 0, 0.031), (100, 100, 100))
-
-        if obj != None:
-            obj.render(img)
+        return atlas.tiles[slot]
 
-        # Overlay the agent on top
-        if agent_dir is not None:
-            tri_fn = point_in_triangle(
-                (0.12, 0.19),
-                (0.87, 0.50),
-                (0.12, 0.81),
-            )
-
-            # Rotate the agent based on its direction
-            tri_fn = rotate_fn(tri_fn, cx=0.5, cy=0.5, theta=0.5*math.pi*agent_dir)
-            fill_coords(img, tri_fn, agent_color)
-
-        # Highlight the cell if needed
-        if highlight:
-            highlight_img(img)
+    def tile_keys(
+        self,
+        agent_poses=None,
+        agent_dirs=None,
+        agent_colors=None,
+        highlight_mask=None
+    ):
+        """
+        Compute the (width, height) array of tile atlas keys to render this
+        grid, given the agents standing in it and the highlighted cells
+        """
 
-        # Downsample the image to perform supersampling/anti-aliasing
-        img = downsample(img, subdivs)
+        # Direction and color of the agent in each cell, -1 if none
+        dirs = np.full((self.width, self.height), -1, dtype=np.int64)
+        colors = np.full((self.width, self.height), -1, dtype=np.int64)
+        if agent_poses is not None and len(agent_poses) > 0:
+            xs, ys = np.asarray(agent_poses).T
+            dirs[xs, ys] = agent_dirs
+            colors[xs, ys] = [COLOR_TO_IDX[color] for color in agent_colors]
 
-        # Cache the rendered tile
-        cls.tile_cache[key] = img
+        if highlight_mask is None:
+            highlight_mask = False
 
-        return img
+        return TileAtlas.pack_key(self.encoding, dirs, colors, highlight_mask)
 
     def render(
         self,
@@ -575,70 +1228,52 @@ class Grid:
         agent_poses=None,
         agent_dirs=None,
         agent_colors=None,
-        highlight_mask=None
+        highlight_mask=None,
+        out=None
     ):
         """
         Render this grid at a given scale
-        :param r: target renderer object
         :param tile_size: tile size in pixels
+        :param out: optional preallocated output image
         """
 
-        if highlight_mask is None:
-            highlight_mask = np.zeros(shape=(self.width, self.height), dtype=np.bool)
-
-        # Compute the total grid size
-        width_px = self.width * tile_size
-        height_px = self.height * tile_size
+        keys = self.tile_keys(agent_poses, agent_dirs, agent_colors, highlight_mask)
 
-        img = np.zeros(shape=(height_px, width_px, 3), dtype=np.uint8)
+        return Grid.get_atlas(tile_size).render(keys, out=out)
 
-        agent_info = {tuple(pos): (agent_dir, agent_color)
-                      for pos, agent_dir, agent_color in zip(agent_poses, agent_dirs, agent_colors)}
-        # Render the grid
-        for j in range(0, self.height):
-            for i in range(0, self.width):
-                cell = self.get(i, j)
+    @staticmethod
+    def render_obs(obs, tile_size=TILE_PIXELS//2, out=None):
+        """
+        Render an agent observation, or a batch of them of shape
+        (..., view_size, view_size, 3), as the agent sees it: standing at the
+        bottom center facing up, with the cells it sees highlighted. Tiles
+        are looked up from the encoding directly, without decoding it.
+        """
 
-                agent_here = (i, j) in agent_info
+        obs = np.asarray(obs)
+        width, height = obs.shape[-3:-1]
 
-                tile_img = Grid.render_tile(
-                    cell,
-                    agent_dir=agent_info[(i, j)][0] if agent_here else None,
-                    agent_color=tuple(COLORS[agent_info[(i, j)][1]]) if agent_here else None,
-                    highlight=highlight_mask[i, j],
-                    tile_size=tile_size
-                )
+        types = obs[..., 0]
+        keys = OBS_TILE_KEYS[types, obs[..., 1], obs[..., 2]]
+        keys[types != OBJECT_TO_IDX['unseen']] += OBS_HIGHLIGHT_KEY
 
-                ymin = j * tile_size
-                ymax = (j+1) * tile_size
-                xmin = i * tile_size
-                xmax = (i+1) * tile_size
-                img[ymin:ymax, xmin:xmax, :] = tile_img
+        # The agent is drawn in red at the bottom center, facing up
+        keys[..., width // 2, height - 1] += OBS_AGENT_KEY
 
-        return img
+        return Grid.get_atlas(tile_size).render(keys, out=out)
 
     def encode(self, vis_mask=None):
         """
         Produce a compact numpy encoding of the grid
         """
 
+        self._sync()
+
         if vis_mask is None:
-            vis_mask = np.ones((self.width, self.height), dtype=bool)
+            return self._encoding.copy()
 
         array = np.zeros((self.width, self.height, 3), dtype='uint8')
-
-        for i in range(self.width):
-            for j in range(self.height):
-                if vis_mask[i, j]:
-                    v = self.get(i, j)
-
-                    if v is None:
-                        array[i, j, 0] = OBJECT_TO_IDX['empty']
-                        array[i, j, 1] = 0
-                        array[i, j, 2] = 0
-
-                    else:
-                        array[i, j, :] = v.encode()
+        array[vis_mask] = self._encoding[vis_mask]
 
         return array
 
@@ -663,37 +1298,92 @@ class Grid:
 
         return grid, vis_mask
 
-    def process_vis(grid, agent_pos):
-        mask = np.zeros(shape=(grid.width, grid.height), dtype=np.bool)
+    @staticmethod
+    def opaque_mask(array):
+        """
+        Mask of the cells of an encoding that the agent can't see behind
+        """
 
-        mask[agent_pos[0], agent_pos[1]] = True
+        types = array[..., 0]
+        closed_door = (types == OBJECT_TO_IDX['door']) & (array[..., 2] != STATE_TO_IDX['open'])
+        return (types == OBJECT_TO_IDX['wall']) | closed_door
 
-        for j in reversed(range(0, grid.height)):
-            for i in range(0, grid.width-1):
-                if not mask[i, j]:
-                    continue
+    @staticmethod
+    def _sweep_vis_row(row, see, width):
+        """
+        Propagate visibility along one row of a view, given as bitmasks
+        of its visible and transparent cells. Returns the updated row and
+        the cells it reveals in the row above. The bitmasks can be ints
+        or integer arrays, to process a batch of views at once.
+        """
 
-                cell = grid.get(i, j)
-                if cell and not cell.see_behind():
-                    continue
+        full = (1 << width) - 1
+
+        # Visible transparent cells reveal the next cell to the right.
+        # The spread through runs of transparent cells is done with a
+        # logarithmic number of shifts (Kogge-Stone occluded fill).
+        gen, pro, step = row & see, see, 1
+        while step < width:
+            gen = gen | (pro & (gen << step))
+            pro = pro & (pro << step)
+            step *= 2
+        left = row | ((gen << 1) & full)
+
+        # Then to the left, starting from the updated row
+        gen, pro, step = left & see, see, 1
+        while step < width:
+            gen = gen | (pro & (gen >> step))
+            pro = pro & (pro >> step)
+            step *= 2
+        row = left | (gen >> 1)
+
+        # Transparent visible cells reveal the cell above them, and the
+        # one above in the direction the sweep was going
+        rightward = left & see & (full >> 1)
+        leftward = row & see & (full - 1)
+        above = (rightward | (rightward << 1) | leftward | (leftward >> 1)) & full
+
+        return row, above
 
-                mask[i+1, j] = True
-                if j > 0:
-                    mask[i+1, j-1] = True
-                    mask[i, j-1] = True
+    @staticmethod
+    def compute_vis(opaque, agent_pos):
+        """
+        Compute the visibility mask of a view from the mask of its opaque
+        cells, propagating visibility from the agent's position upwards.
+        A batch of views of shape (..., width, height) can be passed.
 
-            for i in reversed(range(1, grid.width)):
-                if not mask[i, j]:
-                    continue
+        Each row is processed as an integer bitmask, so the propagation
+        along a row is a handful of shifts instead of a loop over cells.
+        """
 
-                cell = grid.get(i, j)
-                if cell and not cell.see_behind():
-                    continue
+        width, height = opaque.shape[-2:]
+        batched = opaque.ndim > 2
+
+        # Bitmask of the transparent cells of each row, bit i is column i
+        dtype = np.int64 if width < 63 else object
+        bits = np.array([1 << i for i in range(width)], dtype=dtype)
+        see_rows = bits @ ~opaque
+
+        if batched:
+            see_rows = np.moveaxis(see_rows, -1, 0)
+            rows = np.zeros_like(see_rows)
+        else:
+            see_rows = see_rows.tolist()
+            rows = [0] * height
+        rows[agent_pos[1]] |= 1 << agent_pos[0]
 
-                mask[i-1, j] = True
-                if j > 0:
-                    mask[i-1, j-1] = True
-                    mask[i, j-1] = True
+        for j in reversed(range(0, height)):
+            rows[j], above = Grid._sweep_vis_row(rows[j], see_rows[j], width)
+            if j > 0:
+                rows[j-1] |= above
+
+        rows = np.asarray(rows, dtype=dtype)
+        if batched:
+            rows = np.moveaxis(rows, 0, -1)
+        return (rows[..., np.newaxis, :] & bits[:, np.newaxis]) != 0
+
+    def process_vis(grid, agent_pos):
+        mask = Grid.compute_vis(Grid.opaque_mask(grid.encoding), agent_pos)
 
         for j in range(0, grid.height):
             for i in range(0, grid.width):
@@ -705,11 +1395,14 @@ class Grid:
 
 class Agent():
     """Controllable agent class. Has pos, dir, carrying.
+    Whenever the position of the agent is set, it is recorded in an
+    occupancy map shared by the agents of an environment.
     """
 
-    def __init__(self, agent_id):
+    def __init__(self, agent_id, occupancy=None):
         self.id = agent_id
-        self.pos = None
+        self.occupancy = {} if occupancy is None else occupancy
+        self._pos = None
         self.dir = None
         self.carrying = None
         self.step_count = 0
@@ -723,8 +1416,40 @@ class Agent():
         self.step_count = 0
         self.done = False
 
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, pos):
+        occupancy = self.occupancy
+        if self._pos is not None:
+            key = (int(self._pos[0]), int(self._pos[1]))
+            if occupancy.get(key) == self.id:
+                del occupancy[key]
+        if pos is not None:
+            occupancy[(int(pos[0]), int(pos[1]))] = self.id
+        self._pos = pos
+
+
+# Methods of MiniGridEnv handling each action, by name in the enumeration
+# of actions of the environment
+ACTION_HANDLERS = {
+    'left': '_act_left',
+    'right': '_act_right',
+    'forward': '_act_forward',
+    'pickup': '_act_pickup',
+    'drop': '_act_drop',
+    'toggle': '_act_toggle',
+    'no_op': '_act_no_op',
+    'done': '_act_done',
+}
+
+# Action handlers, by environment class and enumeration of actions
+_action_handlers = {}
 
-class MiniGridEnv(MultiAgentEnv, gym.Env):
+
+class MiniGridEnv(gym.Env):
     """
     2D grid world game environment
     """
@@ -735,6 +1460,10 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
     }
     DEFAULT_AGENT_LIST = [DEFAULT_AGENT_ID]
 
+    # Place objects with the rejection sampling of earlier versions, which
+    # uses the RNG differently, to reproduce the levels they generated
+    legacy_placement = False
+
     # Enumeration of possible actions
     class Actions(IntEnum):
         # Turn left, turn right, move forward
@@ -810,11 +1539,12 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
         self.max_steps = max_steps
         self.see_through_walls = see_through_walls
 
-        # Create agents
+        # Create agents, along with the map of the positions they occupy
+        self.occupancy = {}
         self.multiagent = multiagent
         self.num_agents = len(agent_ids)
         self.agent_ids = agent_ids
-        self.agents = {agent_id: Agent(agent_id) for agent_id in agent_ids}
+        self.agents = {agent_id: Agent(agent_id, self.occupancy) for agent_id in agent_ids}
 
         # Initialize the RNG
         self.seed(seed=seed)
@@ -846,20 +1576,93 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
         self.env_step_count = 0
 
         # Return first observation
-        obs_dict = {}
-        for agent_id in self.agent_ids:
-            obs_dict[agent_id] = self.gen_obs(agent_id)
-
         if self.multiagent:
-            return obs_dict
+            return self.gen_obs_batch()[1]
         else:
-            return obs_dict[DEFAULT_AGENT_ID]
+            return self.gen_obs(DEFAULT_AGENT_ID)
 
     def seed(self, seed=1337):
         # Seed the random number generator
         self.np_random, _ = seeding.np_random(seed)
         return [seed]
 
+    def get_state(self):
+        """
+        Take a snapshot of the state of the environment, which can be
+        restored with set_state(). The snapshot refers to the grid, agents
+        and objects of the environment along with copies of their
+        attributes, so that taking and restoring it is cheap. It can
+        also be pickled to restore it into another environment instance.
+        """
+
+        grid = self.grid
+        grid._sync()
+
+        # Objects in the grid, carried by agents or contained in others.
+        # Walls are left out, as they can't be changed once placed.
+        objs = [obj for obj in grid._objs.values() if type(obj) is not Wall]
+        objs.extend(agent.carrying for agent in self.agents.values() if agent.carrying)
+        for obj in objs:
+            if obj.contains is not None:
+                objs.append(obj.contains)
+            if isinstance(obj, Counter) and obj.obj is not None:
+                objs.append(obj.obj)
+
+        # Attributes of the environment, including those specific to
+        # subclasses, which are set when the grid is generated
+        env_attrs = self.__dict__.copy()
+        del env_attrs['window']
+
+        return {
+            'env': env_attrs,
+            'grid': (grid, grid._encoding.copy(), grid._objs.copy(), grid._stateful.copy()),
+            'objects': [(obj, obj.__dict__.copy()) for obj in objs],
+            'agents': [(agent, agent.__dict__.copy()) for agent in self.agents.values()],
+            'np_random': self.np_random.get_state(),
+        }
+
+    def set_state(self, state):
+        """
+        Restore a snapshot taken with get_state()
+        """
+
+        window = self.window
+        self.__dict__.update(state['env'])
+        self.window = window
+
+        grid, encoding, objs, stateful = state['grid']
+        grid._encoding[...] = encoding
+        grid._objs.clear()
+        grid._objs.update(objs)
+        grid._stateful.clear()
+        grid._stateful.update(stateful)
+
+        for obj, attrs in state['objects']:
+            obj.__dict__.update(attrs)
+        for agent, attrs in state['agents']:
+            agent.__dict__.update(attrs)
+        self.update_occupancy()
+
+        self.np_random.set_state(state['np_random'])
+
+    def agent_at(self, x, y):
+        """
+        Get the id of the agent at a given position, or None
+        """
+
+        return self.occupancy.get((x, y))
+
+    def update_occupancy(self):
+        """
+        Rebuild the occupancy map from the positions of the agents, after
+        they were restored without going through Agent.pos
+        """
+
+        self.occupancy.clear()
+        for agent_id, agent in self.agents.items():
+            if agent.pos is not None:
+                self.occupancy[(int(agent.pos[0]), int(agent.pos[1]))] = agent_id
+
     @property
     def steps_remaining(self, agent_id=DEFAULT_AGENT_ID):
         return self.max_steps - self.agents[agent_id].step_count
@@ -1027,6 +1830,65 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
         if size is None:
             size = (self.grid.width, self.grid.height)
 
+        if self.legacy_placement:
+            pos = self._sample_pos_legacy(top, size, reject_fn, max_tries)
+        else:
+            pos = self._sample_pos(top, size, reject_fn, max_tries)
+
+        self.grid.set(*pos, obj)
+
+        if obj is not None:
+            obj.init_pos = pos
+            obj.cur_pos = pos
+
+        return pos
+
+    def _sample_pos(self, top, size, reject_fn, max_tries):
+        """
+        Sample an empty position uniformly in a rectangle, among the cells
+        which are empty in the encoding of the grid and not occupied by
+        an agent. Positions rejected by reject_fn are removed from the
+        candidates until one is accepted.
+        """
+
+        x0, y0 = top
+        x1 = min(x0 + size[0], self.grid.width)
+        y1 = min(y0 + size[1], self.grid.height)
+
+        free = self.grid._encoding[x0:x1, y0:y1, 0] == OBJECT_TO_IDX['empty']
+        for ax, ay in self.occupancy:
+            if x0 <= ax < x1 and y0 <= ay < y1:
+                free[ax - x0, ay - y0] = False
+
+        # Flat indices of the free cells, the first num_free of which
+        # are still candidates
+        cells = free.ravel().nonzero()[0]
+        num_free = len(cells)
+        num_tries = 0
+
+        while True:
+            if num_free == 0 or num_tries > max_tries:
+                raise RecursionError('rejection sampling failed in place_obj')
+
+            num_tries += 1
+
+            idx = self._rand_int(0, num_free)
+            i, j = divmod(int(cells[idx]), y1 - y0)
+            pos = np.array((x0 + i, y0 + j))
+
+            # Check if there is a filtering criterion
+            if reject_fn and reject_fn(self, pos):
+                num_free -= 1
+                cells[idx] = cells[num_free]
+                continue
+
+            return pos
+
+    def _sample_pos_legacy(self, top, size, reject_fn, max_tries):
+        """
+        Sample an empty position in a rectangle by rejection sampling
+        """
+
         num_tries = 0
 
         while True:
@@ -1059,15 +1921,7 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
             if reject_fn and reject_fn(self, pos):
                 continue
 
-            break
-
-        self.grid.set(*pos, obj)
-
-        if obj is not None:
-            obj.init_pos = pos
-            obj.cur_pos = pos
-
-        return pos
+            return pos
 
     def put_obj(self, obj, i, j):
         """
@@ -1224,128 +2078,180 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
 
         if not self.multiagent:
             assert self.num_agents == 1, "Invalid action!"
-            agent_actions = {DEFAULT_AGENT_ID: agent_actions}
-        else:
-            num_active = len([agent_id for agent_id in self.agent_ids if not self.agents[agent_id].done])
-            assert num_active == len(agent_actions), "Incorrect number of agent_actions"
+            return self._step_single(agent_actions)
+
+        num_active = len([agent_id for agent_id in self.agent_ids if not self.agents[agent_id].done])
+        assert num_active == len(agent_actions), "Incorrect number of agent_actions"
+
+        handlers = self._action_handlers()
 
         reward_dict = {}
         info_dict = {}
         for agent_id, action in agent_actions.items():
-            assert not self.agents[agent_id].done, "Action for done agent!"
-
-            reward_dict[agent_id] = 0
-            info_dict[agent_id] = {}
-            action_info = (None, None)
-            self.agents[agent_id].step_count += 1
+            agent = self.agents[agent_id]
+            assert not agent.done, "Action for done agent!"
 
-            # Get the position in front of the agent
-            fwd_pos = self.front_pos(agent_id)
+            agent.step_count += 1
 
-            # Get the contents of the cell in front of the agent
+            # Get the position in front of the agent, and its contents
+            dx, dy = DIR_TO_OFFSET[agent.dir]
+            fwd_pos = (int(agent.pos[0]) + dx, int(agent.pos[1]) + dy)
             fwd_cell = self.grid.get(*fwd_pos)
 
-            # Rotate left
-            if action == self.actions.left:
-                self.agents[agent_id].dir -= 1
-                if self.agents[agent_id].dir < 0:
-                    self.agents[agent_id].dir += 4
-                action_info = ("left_turn", None)
-
-            # Rotate right
-            elif action == self.actions.right:
-                self.agents[agent_id].dir = (self.agents[agent_id].dir + 1) % 4
-                action_info = ("right_turn", None)
-
-            # Move forward
-            elif action == self.actions.forward:
-                for other_id in self.agent_ids:
-                    if other_id != agent_id and np.all(self.agents[other_id].pos == fwd_pos):
-                        # collision between agents!
-                        action_info = ("collision", other_id)
-                        reward_dict[agent_id] = -self.collision_penalty
-                        break
-                else:
-                    if fwd_cell == None or fwd_cell.can_overlap():
-                        self.agents[agent_id].pos = fwd_pos
-                        action_info = ("forward", None)
-                    if fwd_cell != None and fwd_cell.type == 'goal':
-                        if fwd_cell.agent_id == agent_id:
-                            self.agents[agent_id].done = True
-                            reward_dict[agent_id] = self._reward(agent_id=agent_id)
-                            action_info = ("own_goal", None)
-                        else:
-                            action_info = ("other_goal", fwd_cell.agent_id)
-                    if fwd_cell != None and fwd_cell.type == 'lava':
-                        self.agents[agent_id].done = True
-                        action_info = ("lava_death", None)
-
-            # Pick up an object
-            elif action == self.actions.pickup:
-                if self.agents[agent_id].carrying is None:
-                    if fwd_cell:
-                        if 'counter' in fwd_cell.type and fwd_cell.has_obj():
-                            self.agents[agent_id].carrying = fwd_cell.retrieve()
-                            self.agents[agent_id].carrying.cur_pos = np.array([-1, -1])
-                            action_info = ("pickup_counter", self.agents[agent_id].carrying)
-                        elif fwd_cell.can_pickup():
-                            self.agents[agent_id].carrying = fwd_cell
-                            self.agents[agent_id].carrying.cur_pos = np.array([-1, -1])
-                            self.grid.set(*fwd_pos, None)
-                            action_info = ("pickup", self.agents[agent_id].carrying)
-
-            # Drop an object
-            elif action == self.actions.drop:
-                if self.agents[agent_id].carrying:
-                    if fwd_cell and 'counter' in fwd_cell.type and not fwd_cell.has_obj():
-                        action_info = ("drop_counter", self.agents[agent_id].carrying)
-                        fwd_cell.place(self.agents[agent_id].carrying)
-                        self.agents[agent_id].carrying.cur_pos = fwd_pos
-                        self.agents[agent_id].carrying = None
-
-                    if not fwd_cell:
-                        action_info = ("drop", self.agents[agent_id].carrying)
-                        self.grid.set(*fwd_pos, self.agents[agent_id].carrying)
-                        self.agents[agent_id].carrying.cur_pos = fwd_pos
-                        self.agents[agent_id].carrying = None
-
-            # Toggle/activate an object
-            elif action == self.actions.toggle:
-                if fwd_cell:
-                    successful_toggle = fwd_cell.toggle(self, fwd_pos, agent_id)
-                    action_info = ('door', successful_toggle)
-
-            # no movement or action!
-            elif action == self.actions.no_op:
-                action_info = ('no_op', None)
-                pass
-
-            # Done action (not used by default)
-            elif action == self.actions.done:
-                pass
-
-            else:
-                assert False, "unknown action"
+            # Actions given as numpy arrays of one element are unhashable
+            if isinstance(action, np.ndarray):
+                action = action.item()
+            handler = handlers.get(action)
+            assert handler is not None, "unknown action"
+            reward_dict[agent_id], action_info = handler(self, agent_id, agent, fwd_cell, fwd_pos)
 
-            info_dict[agent_id]['action_info'] = action_info
+            info_dict[agent_id] = {'action_info': action_info}
 
         done_dict = {agent_id: self.agents[agent_id].done for agent_id in self.agent_ids}
-        if np.all(list(done_dict.values())):
+        if all(done_dict.values()):
             all_done = True
         elif self.env_step_count >= self.max_steps:
             all_done = True
         else:
             all_done = False
 
-        obs_dict = {}
-        for agent_id in agent_actions.keys():
-            obs_dict[agent_id] = self.gen_obs(agent_id)
+        _, obs_dict = self.gen_obs_batch(list(agent_actions.keys()))
 
         done_dict['__all__'] = all_done
-        if self.multiagent:
-            return obs_dict, reward_dict, done_dict, info_dict
-        else:
-            return obs_dict[DEFAULT_AGENT_ID], reward_dict[DEFAULT_AGENT_ID], done_dict['__all__'], info_dict
+        return obs_dict, reward_dict, done_dict, info_dict
+
+    def _step_single(self, action):
+        """
+        Step of a single-agent environment, equivalent to the multi-agent
+        step but without building the dicts of actions, rewards and dones
+        """
+
+        agent = self.agents[DEFAULT_AGENT_ID]
+        assert not agent.done, "Action for done agent!"
+
+        agent.step_count += 1
+
+        # Get the position in front of the agent, and its contents
+        dx, dy = DIR_TO_OFFSET[agent.dir]
+        fwd_pos = (int(agent.pos[0]) + dx, int(agent.pos[1]) + dy)
+        fwd_cell = self.grid.get(*fwd_pos)
+
+        # Actions given as numpy arrays of one element are unhashable
+        if isinstance(action, np.ndarray):
+            action = action.item()
+        handler = self._action_handlers().get(action)
+        assert handler is not None, "unknown action"
+        reward, action_info = handler(self, DEFAULT_AGENT_ID, agent, fwd_cell, fwd_pos)
+
+        done = agent.done or self.env_step_count >= self.max_steps
+        obs = self.gen_obs(DEFAULT_AGENT_ID)
+
+        return obs, reward, done, {DEFAULT_AGENT_ID: {'action_info': action_info}}
+
+    def _action_handlers(self):
+        """
+        Get the table mapping each action of the environment to the method
+        handling it. Handlers take the id of the agent, the agent, the cell
+        in front of it and its position, and return the reward of the agent
+        along with information about the outcome of the action.
+        """
+
+        key = (type(self), self.actions)
+        handlers = _action_handlers.get(key)
+
+        if handlers is None:
+            handlers = {}
+            for name, method in ACTION_HANDLERS.items():
+                if hasattr(self.actions, name):
+                    handlers.setdefault(getattr(self.actions, name), getattr(type(self), method))
+            _action_handlers[key] = handlers
+
+        return handlers
+
+    # Rotate left
+    def _act_left(self, agent_id, agent, fwd_cell, fwd_pos):
+        agent.dir -= 1
+        if agent.dir < 0:
+            agent.dir += 4
+        return 0, ("left_turn", None)
+
+    # Rotate right
+    def _act_right(self, agent_id, agent, fwd_cell, fwd_pos):
+        agent.dir = (agent.dir + 1) % 4
+        return 0, ("right_turn", None)
+
+    # Move forward
+    def _act_forward(self, agent_id, agent, fwd_cell, fwd_pos):
+        other_id = self.occupancy.get(fwd_pos)
+        if other_id is not None and other_id != agent_id:
+            # collision between agents!
+            return -self.collision_penalty, ("collision", other_id)
+
+        reward = 0
+        action_info = (None, None)
+        if fwd_cell == None or fwd_cell.can_overlap():
+            agent.pos = np.array(fwd_pos)
+            action_info = ("forward", None)
+        if fwd_cell != None and fwd_cell.type == 'goal':
+            if fwd_cell.agent_id == agent_id:
+                agent.done = True
+                reward = self._reward(agent_id=agent_id)
+                action_info = ("own_goal", None)
+            else:
+                action_info = ("other_goal", fwd_cell.agent_id)
+        if fwd_cell != None and fwd_cell.type == 'lava':
+            agent.done = True
+            action_info = ("lava_death", None)
+        return reward, action_info
+
+    # Pick up an object
+    def _act_pickup(self, agent_id, agent, fwd_cell, fwd_pos):
+        action_info = (None, None)
+        if agent.carrying is None:
+            if fwd_cell:
+                if 'counter' in fwd_cell.type and fwd_cell.has_obj():
+                    agent.carrying = fwd_cell.retrieve()
+                    agent.carrying.cur_pos = np.array([-1, -1])
+                    action_info = ("pickup_counter", agent.carrying)
+                elif fwd_cell.can_pickup():
+                    agent.carrying = fwd_cell
+                    agent.carrying.cur_pos = np.array([-1, -1])
+                    self.grid.set(*fwd_pos, None)
+                    action_info = ("pickup", agent.carrying)
+        return 0, action_info
+
+    # Drop an object
+    def _act_drop(self, agent_id, agent, fwd_cell, fwd_pos):
+        action_info = (None, None)
+        if agent.carrying:
+            if fwd_cell and 'counter' in fwd_cell.type and not fwd_cell.has_obj():
+                action_info = ("drop_counter", agent.carrying)
+                fwd_cell.place(agent.carrying)
+                agent.carrying.cur_pos = np.array(fwd_pos)
+                agent.carrying = None
+
+            if not fwd_cell:
+                action_info = ("drop", agent.carrying)
+                self.grid.set(*fwd_pos, agent.carrying)
+                agent.carrying.cur_pos = np.array(fwd_pos)
+                agent.carrying = None
+        return 0, action_info
+
+    # Toggle/activate an object
+    def _act_toggle(self, agent_id, agent, fwd_cell, fwd_pos):
+        action_info = (None, None)
+        if fwd_cell:
+            successful_toggle = fwd_cell.toggle(self, np.array(fwd_pos), agent_id)
+            action_info = ('door', successful_toggle)
+        return 0, action_info
+
+    # Done action (not used by default)
+    def _act_done(self, agent_id, agent, fwd_cell, fwd_pos):
+        return 0, (None, None)
+
+    # no movement or action!
+    def _act_no_op(self, agent_id, agent, fwd_cell, fwd_pos):
+        return 0, ('no_op', None)
 
     def gen_obs_grid(self, agent_id=DEFAULT_AGENT_ID):
         """
@@ -1379,15 +2285,47 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
 
         return grid, vis_mask
 
+    def gen_obs_encoding(self, agent_id=DEFAULT_AGENT_ID):
+        """
+        Generate the encoding of the sub-grid observed by the agent, along
+        with its visibility mask. This is equivalent to encoding the output
+        of gen_obs_grid, but works directly on the grid encoding.
+        """
+
+        agent = self.agents[agent_id]
+        sz = self.agent_view_size
+
+        topX, topY, _, _ = self.get_view_exts(agent_id=agent_id)
+
+        # Rotate the view so that the agent is facing up
+        view = self.grid.slice_encoding(topX, topY, sz, sz)
+        view = np.rot90(view, k=-(agent.dir + 1))
+
+        agent_pos = (sz // 2, sz - 1)
+
+        # Process occluders and visibility
+        if not self.see_through_walls:
+            vis_mask = Grid.compute_vis(Grid.opaque_mask(view), agent_pos)
+        else:
+            vis_mask = np.ones(shape=(sz, sz), dtype=bool)
+
+        image = np.zeros((sz, sz, 3), dtype='uint8')
+        image[vis_mask] = view[vis_mask]
+
+        # Make it so the agent sees what it's carrying
+        if agent.carrying:
+            image[agent_pos] = agent.carrying.encode()
+        else:
+            image[agent_pos] = (OBJECT_TO_IDX['empty'], 0, 0)
+
+        return image, vis_mask
+
     def gen_obs(self, agent_id=DEFAULT_AGENT_ID):
         """
         Generate the agent's view (partially observable, low-resolution encoding)
         """
 
-        grid, vis_mask = self.gen_obs_grid(agent_id=agent_id)
-
-        # Encode the partially observable view into a numpy array
-        image = grid.encode(vis_mask)
+        image, _ = self.gen_obs_encoding(agent_id=agent_id)
 
         assert hasattr(self, 'mission'), "environments must define a textual mission string"
 
@@ -1403,25 +2341,97 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
 
         return obs
 
-    def get_obs_render(self, obs, tile_size=TILE_PIXELS//2):
+    def gen_obs_batch(self, agent_ids=None):
         """
-        Render an agent observation for visualization
+        Generate the observations of several agents (all of them by
+        default) at once, gathering their views from the grid encoding in
+        a single indexing operation. Returns the stacked images, of shape
+        (num_agents, view_size, view_size, 3), along with the observation
+        of each agent by id, as gen_obs() generates it, whose image is a
+        view of the stacked images.
         """
 
-        grid, vis_mask = Grid.decode(obs)
+        if agent_ids is None:
+            agent_ids = self.agent_ids
+        agents = [self.agents[agent_id] for agent_id in agent_ids]
+        sz = self.agent_view_size
+        if not agents:
+            return np.zeros((0, sz, sz, 3), dtype='uint8'), {}
 
-        # Render the whole grid
-        img = grid.render(
-            tile_size,
-            agent_poses=[(self.agent_view_size // 2, self.agent_view_size - 1)],
-            agent_dirs=[3],
-            highlight_mask=vis_mask,
-            agent_colors=['red']
-        )
+        offsets = _view_offsets.get(sz)
+        if offsets is None:
+            offsets = _view_offsets[sz] = view_offsets(sz)
 
-        return img
+        # Pad the grid encoding with walls, so that views can extend
+        # past its edges
+        encoding = self.grid.encoding
+        padded = np.empty((self.grid.width + 2 * sz, self.grid.height + 2 * sz, 3), dtype='uint8')
+        padded[:] = Wall().encode()
+        padded[sz:-sz, sz:-sz] = encoding
+
+        pos = np.array([agent.pos for agent in agents], dtype=np.int64) + sz
+        offsets = offsets[[agent.dir for agent in agents]]
+        xs = pos[:, 0, np.newaxis, np.newaxis] + offsets[:, 0]
+        ys = pos[:, 1, np.newaxis, np.newaxis] + offsets[:, 1]
+        images = padded[xs, ys]
+
+        agent_pos = (sz // 2, sz - 1)
+
+        # Process occluders and visibility
+        if not self.see_through_walls:
+            vis_mask = Grid.compute_vis(Grid.opaque_mask(images), agent_pos)
+            images[~vis_mask] = 0
+
+        # Make it so the agents see what they're carrying
+        for i, agent in enumerate(agents):
+            if agent.carrying:
+                images[i, agent_pos[0], agent_pos[1]] = agent.carrying.encode()
+            else:
+                images[i, agent_pos[0], agent_pos[1]] = (OBJECT_TO_IDX['empty'], 0, 0)
 
-    def render(self, mode='human', close=False, highlight=True, tile_size=TILE_PIXELS, agent_id=DEFAULT_AGENT_ID, agent_view=True):
+        assert hasattr(self, 'mission'), "environments must define a textual mission string"
+
+        obs_dict = {
+            agent_id: {
+                'image': images[i],
+                'direction': agent.dir,
+                'mission': self.mission
+            }
+            for i, (agent_id, agent) in enumerate(zip(agent_ids, agents))
+        }
+
+        return images, obs_dict
+
+    def gen_full_encoding(self, out=None):
+        """
+        Generate the fully observable encoding of the grid, with the agents
+        drawn in their cells using their index as color (cycling through the
+        colors when there are more agents than colors), optionally into a
+        preallocated output buffer. This is a copy of the grid encoding,
+        which is kept up to date as cells are set and objects change state,
+        so that only the agent cells are written.
+        """
+
+        if out is None:
+            image = self.grid.encode()
+        else:
+            image = out
+            image[...] = self.grid.encoding
+
+        for i, agent_id in enumerate(self.agent_ids):
+            agent = self.agents[agent_id]
+            image[agent.pos[0], agent.pos[1]] = (OBJECT_TO_IDX['agent'], i % len(IDX_TO_COLOR), agent.dir)
+
+        return image
+
+    def get_obs_render(self, obs, tile_size=TILE_PIXELS//2, out=None):
+        """
+        Render an agent observation for visualization
+        """
+
+        return Grid.render_obs(obs, tile_size, out=out)
+
+    def render(self, mode='human', close=False, highlight=True, tile_size=TILE_PIXELS, agent_id=DEFAULT_AGENT_ID, agent_view=True, out=None):
         """
         Render the whole-grid human view
         """
@@ -1436,9 +2446,12 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
             self.window = gym_minigrid.window.Window('gym_minigrid')
             self.window.show(block=False)
 
-        if agent_view:
+        # Mask of which cells to highlight
+        highlight_mask = None
+
+        if agent_view and highlight:
             # Compute which cells are visible to the agent
-            _, vis_mask = self.gen_obs_grid(agent_id)
+            _, vis_mask = self.gen_obs_encoding(agent_id)
 
             # Compute the world coordinates of the bottom-left corner
             # of the agent's view area
@@ -1447,34 +2460,25 @@ class MiniGridEnv(MultiAgentEnv, gym.Env):
             top_left = self.agents[agent_id].pos + f_vec * \
                 (self.agent_view_size-1) - r_vec * (self.agent_view_size // 2)
 
-            # Mask of which cells to highlight
-            highlight_mask = np.zeros(shape=(self.width, self.height), dtype=np.bool)
+            # Compute the world coordinates of the visible cells
+            vis_i, vis_j = np.nonzero(vis_mask)
+            abs_i = top_left[0] - f_vec[0] * vis_j + r_vec[0] * vis_i
+            abs_j = top_left[1] - f_vec[1] * vis_j + r_vec[1] * vis_i
 
-            # For each cell in the visibility mask
-            for vis_j in range(0, self.agent_view_size):
-                for vis_i in range(0, self.agent_view_size):
-                    # If this cell is not visible, don't highlight it
-                    if not vis_mask[vis_i, vis_j]:
-                        continue
-
-                    # Compute the world coordinates of this cell
-                    abs_i, abs_j = top_left - (f_vec * vis_j) + (r_vec * vis_i)
-
-                    if abs_i < 0 or abs_i >= self.width:
-                        continue
-                    if abs_j < 0 or abs_j >= self.height:
-                        continue
-
-                    # Mark this cell to be highlighted
-                    highlight_mask[abs_i, abs_j] = True
+            # Highlight those which are inside the grid
+            inside = (abs_i >= 0) & (abs_i < self.width) & \
+                (abs_j >= 0) & (abs_j < self.height)
+            highlight_mask = np.zeros(shape=(self.width, self.height), dtype=np.bool)
+            highlight_mask[abs_i[inside], abs_j[inside]] = True
 
         # Render the whole grid
         img = self.grid.render(
             tile_size,
             [self.agents[agent_id].pos for agent_id in self.agent_ids],
             [self.agents[agent_id].dir for agent_id in self.agent_ids],
-            [IDX_TO_COLOR[i] for i in range(len(self.agent_ids))],
-            highlight_mask=highlight_mask if agent_view and highlight else None
+            [IDX_TO_COLOR[i % len(IDX_TO_COLOR)] for i in range(len(self.agent_ids))],
+            highlight_mask=highlight_mask,
+            out=out
         )
 
         if mode == 'human':
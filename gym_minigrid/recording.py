@@ -0,0 +1,252 @@
+import os
+import json
+import numpy as np
+import gym
+from .minigrid import DEFAULT_AGENT_ID
+
+# Index entry of a recorded episode: its first record, its number of steps,
+# the seed it was generated with (-1 if unknown) and the id of its mission
+EPISODE_DTYPE = np.dtype([
+    ('start', np.int64),
+    ('length', np.int32),
+    ('seed', np.int64),
+    ('mission', np.int32),
+])
+
+
+def record_dtype(image_shape, image_dtype='uint8'):
+    """
+    Data type of the record stored for each observation of an episode
+    """
+
+    return np.dtype([
+        ('image', image_dtype, tuple(image_shape)),
+        ('action', np.int8),
+        ('reward', np.float32),
+        ('done', np.bool_),
+        ('pos', np.int16, (2,)),
+        ('dir', np.int8),
+    ])
+
+
+def chunk_path(path, chunk_idx):
+    return os.path.join(path, 'records_%05d.bin' % chunk_idx)
+
+
+class EpisodeRecorder(gym.core.Wrapper):
+    """
+    Wrapper recording the episodes of a single-agent environment into
+    preallocated, chunked memory-mapped files in a directory.
+
+    A record is stored for every observation, along with the action taken
+    after it, the reward and done flag this action produced, and the
+    position and direction of the agent. An episode of T steps is stored as
+    T+1 consecutive records, the last one holding the final observation
+    with an action of -1. An index of the episodes is kept with the seed
+    each one was generated with. If a seed is given, episode i is generated
+    with seed + i, otherwise the seed last passed to env.seed() is used for
+    the episode which follows it, and -1 is stored for the others.
+
+    Use EpisodeReader to read the recorded episodes.
+    """
+
+    def __init__(self, env, path, chunk_size=1 << 16, seed=None):
+        super().__init__(env)
+        assert not self.unwrapped.multiagent, 'only single-agent envs can be recorded'
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.base_seed = seed
+        os.makedirs(path, exist_ok=True)
+
+        image_space = self.observation_space.spaces['image']
+        self.dtype = record_dtype(image_space.shape, image_space.dtype)
+
+        self.chunk = None
+        self.num_chunks = 0
+        self.num_records = 0
+
+        self.episodes = []
+        self.missions = {}
+
+        # Seed of the next episode, and the episode being recorded
+        self.next_seed = -1
+        self.episode = None
+
+    def seed(self, seed=None):
+        self.next_seed = -1 if seed is None else seed
+        return self.env.seed(seed)
+
+    def reset(self, **kwargs):
+        self._end_episode()
+
+        if self.base_seed is not None:
+            self.next_seed = self.base_seed + len(self.episodes)
+            self.env.seed(self.next_seed)
+
+        obs = self.env.reset(**kwargs)
+
+        mission = self.missions.setdefault(obs['mission'], len(self.missions))
+        self.episode = [self.num_records, 0, self.next_seed, mission]
+        self.next_seed = -1
+        self._write(obs)
+
+        return obs
+
+    def step(self, action):
+        assert self.episode is not None, 'no episode is being recorded, call reset() after done'
+
+        obs, reward, done, info = self.env.step(action)
+
+        # Complete the record of the observation the action was taken from
+        last = (self.num_records - 1) % self.chunk_size
+        self.chunk['action'][last] = action
+        self.chunk['reward'][last] = reward
+        self.chunk['done'][last] = done
+
+        self._write(obs)
+        self.episode[1] += 1
+        if done:
+            self._end_episode()
+
+        return obs, reward, done, info
+
+    def _write(self, obs):
+        """
+        Write the record of a new observation
+        """
+
+        idx = self.num_records % self.chunk_size
+        if idx == 0:
+            self._new_chunk()
+
+        agent = self.unwrapped.agents[DEFAULT_AGENT_ID]
+        self.chunk['image'][idx] = obs['image']
+        self.chunk['action'][idx] = -1
+        self.chunk['pos'][idx] = agent.pos
+        self.chunk['dir'][idx] = agent.dir
+        self.num_records += 1
+
+    def _new_chunk(self):
+        if self.chunk is not None:
+            self.chunk.flush()
+        self.chunk = np.memmap(
+            chunk_path(self.path, self.num_chunks),
+            dtype=self.dtype,
+            mode='w+',
+            shape=(self.chunk_size,)
+        )
+        self.num_chunks += 1
+
+    def _end_episode(self):
+        if self.episode is not None:
+            self.episodes.append(tuple(self.episode))
+            self.episode = None
+
+    def flush(self):
+        """
+        Write the recorded records and the episode index to disk.
+        Episodes still being recorded are not indexed yet.
+        """
+
+        if self.chunk is not None:
+            self.chunk.flush()
+
+        np.save(os.path.join(self.path, 'episodes.npy'), np.array(self.episodes, dtype=EPISODE_DTYPE))
+
+        meta = {
+            'image_shape': self.dtype['image'].shape,
+            'image_dtype': self.dtype['image'].base.str,
+            'chunk_size': self.chunk_size,
+            'num_records': self.num_records,
+            'missions': sorted(self.missions, key=self.missions.get),
+        }
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    def close(self):
+        # Index the episode being recorded, if any, and trim the
+        # last chunk to the records it holds
+        self._end_episode()
+        self.flush()
+        if self.chunk is not None:
+            self.chunk = None
+            num_last = self.num_records - (self.num_chunks - 1) * self.chunk_size
+            os.truncate(chunk_path(self.path, self.num_chunks - 1), num_last * self.dtype.itemsize)
+
+        return self.env.close()
+
+
+class EpisodeReader:
+    """
+    Random access to the records of episodes saved by EpisodeRecorder.
+    Chunk files are memory-mapped when first accessed, so that only the
+    records read are loaded from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.dtype = record_dtype(meta['image_shape'], meta['image_dtype'])
+        self.chunk_size = meta['chunk_size']
+        self.num_records = meta['num_records']
+        self.missions = meta['missions']
+
+        self.episodes = np.load(os.path.join(path, 'episodes.npy'))
+
+        self.chunks = {}
+
+    def __len__(self):
+        return self.num_records
+
+    @property
+    def num_episodes(self):
+        return len(self.episodes)
+
+    def _chunk(self, chunk_idx):
+        chunk = self.chunks.get(chunk_idx)
+        if chunk is None:
+            size = min(self.chunk_size, self.num_records - chunk_idx * self.chunk_size)
+            chunk = np.memmap(chunk_path(self.path, chunk_idx), dtype=self.dtype, mode='r', shape=(size,))
+            self.chunks[chunk_idx] = chunk
+        return chunk
+
+    def __getitem__(self, index):
+        """
+        Get a record by index, or an array of records for a slice or an
+        array of indices
+        """
+
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += self.num_records
+            assert 0 <= index < self.num_records, 'record index out of range'
+            chunk_idx, idx = divmod(int(index), self.chunk_size)
+            return self._chunk(chunk_idx)[idx]
+
+        if isinstance(index, slice):
+            indices = np.arange(*index.indices(self.num_records))
+        else:
+            indices = np.asarray(index)
+            indices = np.where(indices < 0, indices + self.num_records, indices)
+        records = np.empty(len(indices), dtype=self.dtype)
+        chunk_ids, idxs = np.divmod(indices, self.chunk_size)
+        for chunk_idx in np.unique(chunk_ids):
+            sel = chunk_ids == chunk_idx
+            records[sel] = self._chunk(chunk_idx)[idxs[sel]]
+
+        return records
+
+    def episode(self, episode_idx):
+        """
+        Get the records of an episode, the last one holding the final
+        observation
+        """
+
+        start, length, _, _ = self.episodes[episode_idx]
+        return self[start:start+length+1]
+
+    def mission(self, episode_idx):
+        return self.missions[self.episodes[episode_idx]['mission']]
@@ -15,27 +15,49 @@ def downsample(img, factor):
 
     return img
 
+def pixel_centers(height, width):
+    """
+    Get the coordinates of the centers of the pixels of an image, as
+    (height, width) arrays of x and y values in the unit square
+    """
+
+    key = (height, width)
+    if key not in _pixel_centers:
+        xs = (np.arange(width) + 0.5) / width
+        ys = (np.arange(height) + 0.5) / height
+        xs, ys = np.meshgrid(xs, ys)
+        xs.flags.writeable = False
+        ys.flags.writeable = False
+        _pixel_centers[key] = (xs, ys)
+
+    return _pixel_centers[key]
+
+# Pixel center coordinates, cached by image size
+_pixel_centers = {}
+
 def fill_coords(img, fn, color):
     """
     Fill pixels of an image with coordinates matching a filter function
+
+    The filter function is evaluated once, on arrays holding the
+    coordinates of all the pixel centers, and returns a boolean mask.
     """
 
-    for y in range(img.shape[0]):
-        for x in range(img.shape[1]):
-            yf = (y + 0.5) / img.shape[0]
-            xf = (x + 0.5) / img.shape[1]
-            if fn(xf, yf):
-                img[y, x] = color
+    xs, ys = pixel_centers(img.shape[0], img.shape[1])
+    img[fn(xs, ys)] = color
 
     return img
 
 def rotate_fn(fin, cx, cy, theta):
+    cos = math.cos(-theta)
+    sin = math.sin(-theta)
+
     def fout(x, y):
         x = x - cx
         y = y - cy
 
-        x2 = cx + x * math.cos(-theta) - y * math.sin(-theta)
-        y2 = cy + y * math.cos(-theta) + x * math.sin(-theta)
+        x2 = cx + x * cos - y * sin
+        y2 = cy + y * cos + x * sin
 
         return fin(x2, y2)
 
@@ -54,20 +76,16 @@ def point_in_line(x0, y0, x1, y1, r):
     ymax = max(y0, y1) + r
 
     def fn(x, y):
-        # Fast, early escape test
-        if x < xmin or x > xmax or y < ymin or y > ymax:
-            return False
-
-        q = np.array([x, y])
-        pq = q - p0
-
         # Closest point on line
-        a = np.dot(pq, dir)
+        a = (x - x0) * dir[0] + (y - y0) * dir[1]
         a = np.clip(a, 0, dist)
-        p = p0 + a * dir
+        dx = x - (x0 + a * dir[0])
+        dy = y - (y0 + a * dir[1])
+
+        dist_to_line = np.sqrt(dx * dx + dy * dy)
 
-        dist_to_line = np.linalg.norm(q - p)
-        return dist_to_line <= r
+        return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax) & \
+            (dist_to_line <= r)
 
     return fn
 
@@ -78,7 +96,7 @@ def point_in_circle(cx, cy, r):
 
 def point_in_rect(xmin, xmax, ymin, ymax):
     def fn(x, y):
-        return x >= xmin and x <= xmax and y >= ymin and y <= ymax
+        return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
     return fn
 
 def point_in_triangle(a, b, c):
@@ -86,25 +104,27 @@ def point_in_triangle(a, b, c):
     b = np.array(b)
     c = np.array(c)
 
-    def fn(x, y):
-        v0 = c - a
-        v1 = b - a
-        v2 = np.array((x, y)) - a
+    v0 = c - a
+    v1 = b - a
+
+    # Compute dot products
+    dot00 = np.dot(v0, v0)
+    dot01 = np.dot(v0, v1)
+    dot11 = np.dot(v1, v1)
+    inv_denom = 1 / (dot00 * dot11 - dot01 * dot01)
 
-        # Compute dot products
-        dot00 = np.dot(v0, v0)
-        dot01 = np.dot(v0, v1)
-        dot02 = np.dot(v0, v2)
-        dot11 = np.dot(v1, v1)
-        dot12 = np.dot(v1, v2)
+    def fn(x, y):
+        v2x = x - a[0]
+        v2y = y - a[1]
+        dot02 = v0[0] * v2x + v0[1] * v2y
+        dot12 = v1[0] * v2x + v1[1] * v2y
 
         # Compute barycentric coordinates
-        inv_denom = 1 / (dot00 * dot11 - dot01 * dot01)
         u = (dot11 * dot02 - dot01 * dot12) * inv_denom
         v = (dot00 * dot12 - dot01 * dot02) * inv_denom
 
         # Check if point is in triangle
-        return (u >= 0) and (v >= 0) and (u + v) < 1
+        return (u >= 0) & (v >= 0) & ((u + v) < 1)
 
     return fn
 
@@ -0,0 +1,241 @@
+import numpy as np
+import gym
+
+# Entry of a logged episode: the index of its env id, the seed it was
+# generated with and its number of steps
+EPISODE_DTYPE = np.dtype([
+    ('env', np.int32),
+    ('seed', np.int64),
+    ('length', np.int32),
+])
+
+
+class ReplayLog:
+    """
+    Compact log of episodes, storing only the env id, seed and actions of
+    each episode. Since environments generate their grid from the seeded
+    RNG, this is enough to reconstruct the observations and frames of the
+    episodes with a Replayer, as long as the environment only uses its
+    own RNG (multi-agent environments use the global numpy one).
+    """
+
+    def __init__(self):
+        self.env_ids = []
+
+        # Index of the env id and seed of each episode, and its actions
+        self.episodes = []
+        self.actions = []
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def add(self, env_id, seed, actions):
+        """
+        Add an episode to the log
+        """
+
+        if env_id not in self.env_ids:
+            self.env_ids.append(env_id)
+
+        self.episodes.append((self.env_ids.index(env_id), seed))
+        self.actions.append(np.asarray(actions, dtype=np.int8))
+
+    def __getitem__(self, idx):
+        """
+        Get the (env_id, seed, actions) of an episode
+        """
+
+        env_idx, seed = self.episodes[idx]
+        return self.env_ids[env_idx], seed, self.actions[idx]
+
+    def save(self, path):
+        """
+        Save the log to an .npz file, with the actions of all the
+        episodes concatenated into a single array
+        """
+
+        episodes = np.zeros(len(self), dtype=EPISODE_DTYPE)
+        for i, ((env_idx, seed), actions) in enumerate(zip(self.episodes, self.actions)):
+            episodes[i] = (env_idx, seed, len(actions))
+
+        np.savez_compressed(
+            path,
+            env_ids=np.array(self.env_ids),
+            episodes=episodes,
+            actions=np.concatenate(self.actions) if self.actions else np.zeros(0, dtype=np.int8)
+        )
+
+    @classmethod
+    def load(cls, path):
+        log = cls()
+        with np.load(path) as data:
+            episodes = data['episodes']
+            log.env_ids = [str(env_id) for env_id in data['env_ids']]
+            log.episodes = [(int(env_idx), int(seed)) for env_idx, seed in zip(episodes['env'], episodes['seed'])]
+            # Splitting an empty array gives one empty episode
+            if len(episodes) > 0:
+                log.actions = np.split(data['actions'], np.cumsum(episodes['length'])[:-1])
+        return log
+
+    @classmethod
+    def from_recording(cls, reader, env_id):
+        """
+        Build a log from the episodes saved by an EpisodeRecorder whose
+        seed is known
+        """
+
+        log = cls()
+        for i, episode in enumerate(reader.episodes):
+            if episode['seed'] >= 0:
+                actions = reader.episode(i)['action'][:-1]
+                log.add(env_id, int(episode['seed']), actions)
+        return log
+
+
+class ReplayLogger(gym.core.Wrapper):
+    """
+    Wrapper logging the episodes of an environment into a ReplayLog.
+    If a seed is given, episode i is generated with seed + i, otherwise
+    env.seed() must be called before each reset.
+    """
+
+    def __init__(self, env, log, seed=None):
+        super().__init__(env)
+        self.log = log
+        self.base_seed = seed
+        self.env_id = env.spec.id
+
+        self.next_seed = None
+        self.num_episodes = 0
+        self.episode = None
+
+    def seed(self, seed=None):
+        self.next_seed = seed
+        return self.env.seed(seed)
+
+    def reset(self, **kwargs):
+        self._end_episode()
+
+        if self.base_seed is not None:
+            self.next_seed = self.base_seed + self.num_episodes
+            self.env.seed(self.next_seed)
+        assert self.next_seed is not None, 'the env must be seeded before each episode'
+
+        self.episode = (self.next_seed, [])
+        self.next_seed = None
+        self.num_episodes += 1
+
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+
+        self.episode[1].append(action)
+        if done:
+            self._end_episode()
+
+        return obs, reward, done, info
+
+    def _end_episode(self):
+        if self.episode is not None:
+            self.log.add(self.env_id, *self.episode)
+            self.episode = None
+
+    def close(self):
+        self._end_episode()
+        return self.env.close()
+
+
+class Replayer:
+    """
+    Reconstruct logged episodes by replaying their actions. One environment
+    is kept per env id, so that replaying many episodes is cheap. Replayed
+    episodes are returned as dicts of arrays holding the image observation
+    of every step (including the final one), the rewards and done flags,
+    and optionally the frames rendered at every step.
+    """
+
+    def __init__(self, frames=False, tile_size=8, highlight=True):
+        self.frames = frames
+        self.tile_size = tile_size
+        self.highlight = highlight
+        self.envs = {}
+
+    def replay(self, env_id, seed, actions):
+        """
+        Replay one episode
+        """
+
+        env = self.envs.get(env_id)
+        if env is None:
+            env = self.envs[env_id] = gym.make(env_id)
+        unwrapped = env.unwrapped
+
+        env.seed(seed)
+        obs = env.reset()
+
+        num_steps = len(actions)
+        images = np.empty((num_steps + 1,) + obs['image'].shape, dtype=obs['image'].dtype)
+        rewards = np.zeros(num_steps, dtype=np.float32)
+        dones = np.zeros(num_steps, dtype=np.bool_)
+        images[0] = obs['image']
+
+        if self.frames:
+            frame = unwrapped.render('rgb_array', highlight=self.highlight, tile_size=self.tile_size)
+            frames = np.empty((num_steps + 1,) + frame.shape, dtype=np.uint8)
+            frames[0] = frame
+
+        for t, action in enumerate(actions):
+            obs, rewards[t], dones[t], _ = env.step(action)
+            images[t + 1] = obs['image']
+            if self.frames:
+                unwrapped.render('rgb_array', highlight=self.highlight, tile_size=self.tile_size, out=frames[t + 1])
+
+        episode = {
+            'image': images,
+            'reward': rewards,
+            'done': dones,
+        }
+        if self.frames:
+            episode['frames'] = frames
+
+        return episode
+
+    def replay_log(self, log, indices=None, num_workers=None, chunksize=16):
+        """
+        Replay episodes of a log, in order, optionally in a pool of
+        worker processes. Returns an iterator over the replayed episodes.
+        """
+
+        if indices is None:
+            indices = range(len(log))
+        episodes = (log[i] for i in indices)
+
+        if not num_workers:
+            return (self.replay(*episode) for episode in episodes)
+
+        return self._replay_pool(episodes, num_workers, chunksize)
+
+    def _replay_pool(self, episodes, num_workers, chunksize):
+        import multiprocessing
+
+        with multiprocessing.Pool(
+            num_workers,
+            initializer=_init_worker,
+            initargs=(self.frames, self.tile_size, self.highlight)
+        ) as pool:
+            for episode in pool.imap(_replay_worker, episodes, chunksize):
+                yield episode
+
+
+# Replayer of each worker process
+_worker_replayer = None
+
+
+def _init_worker(frames, tile_size, highlight):
+    global _worker_replayer
+    _worker_replayer = Replayer(frames, tile_size, highlight)
+
+
+def _replay_worker(episode):
+    return _worker_replayer.replay(*episode)
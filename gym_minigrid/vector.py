@@ -0,0 +1,440 @@
+import weakref
+import multiprocessing
+import gym
+import numpy as np
+from .minigrid import OBJECT_TO_IDX, STATE_TO_IDX, DIR_TO_VEC, TILE_PIXELS, MiniGridEnv, Grid, Box, Wall, DEFAULT_AGENT_ID, view_offsets
+
+# Encoding of an empty cell
+EMPTY_ENCODING = np.array([OBJECT_TO_IDX['empty'], 0, 0], dtype='uint8')
+
+# Object types the agent can walk over, indexed by type
+# Doors are handled separately since this depends on their state
+CAN_OVERLAP = np.zeros(len(OBJECT_TO_IDX), dtype=bool)
+for obj_type in ['empty', 'floor', 'goal', 'lava']:
+    CAN_OVERLAP[OBJECT_TO_IDX[obj_type]] = True
+
+# Object types the agent can pick up, indexed by type
+CAN_PICKUP = np.zeros(len(OBJECT_TO_IDX), dtype=bool)
+for obj_type in ['key', 'ball', 'box']:
+    CAN_PICKUP[OBJECT_TO_IDX[obj_type]] = True
+
+
+class VectorMiniGridEnv:
+    """
+    Run several copies of a registered environment in lock-step, with their
+    state stored as stacked numpy arrays. Levels are generated by each
+    copy's own reset(), after which the semantics of MiniGridEnv.step are
+    applied to all copies at once. Copies are reset automatically when
+    their episode ends.
+
+    Only single-agent environments which don't override step() are
+    supported, since custom step logic can't be applied to the arrays.
+    """
+
+    def __init__(self, env_id, num_envs, seed=None):
+        self.envs = [gym.make(env_id).unwrapped for _ in range(num_envs)]
+
+        env = self.envs[0]
+        assert not env.multiagent, "multi-agent environments are not supported"
+        assert type(env).step is MiniGridEnv.step, \
+            "%s overrides step, which can't be vectorized" % type(env).__name__
+
+        self.num_envs = num_envs
+        self.width = env.width
+        self.height = env.height
+        self.max_steps = env.max_steps
+        self.agent_view_size = env.agent_view_size
+        self.see_through_walls = env.see_through_walls
+
+        self.actions = env.actions
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+
+        # The grids are padded with walls so that views extending past
+        # the edges can be gathered without bounds checks
+        pad = self.agent_view_size
+        self._pad = pad
+        self._padded = np.empty(
+            (num_envs, self.width + 2 * pad, self.height + 2 * pad, 3),
+            dtype='uint8'
+        )
+        self._padded[:] = Wall().encode()
+        self.grid = self._padded[:, pad:pad+self.width, pad:pad+self.height]
+
+        # Contents of the boxes in each grid, unseen (zero) if none
+        self.contents = np.zeros_like(self.grid)
+
+        self.agent_pos = np.zeros((num_envs, 2), dtype=np.int64)
+        self.agent_dir = np.zeros(num_envs, dtype=np.int64)
+        self.carrying = np.zeros((num_envs, 3), dtype='uint8')
+        self.carrying_contents = np.zeros((num_envs, 3), dtype='uint8')
+        self.step_count = np.zeros(num_envs, dtype=np.int64)
+        self.missions = [None] * num_envs
+
+        self._dir_vec = np.array(DIR_TO_VEC)
+        self._view_offsets = view_offsets(self.agent_view_size)
+
+        if seed is not None:
+            self.seed(seed)
+
+    def seed(self, seed=1337):
+        for i, env in enumerate(self.envs):
+            env.seed(seed + i)
+        return [seed + i for i in range(self.num_envs)]
+
+    def _load(self, i):
+        """
+        Generate a new level for copy i and load it into the arrays
+        """
+
+        env = self.envs[i]
+        env.reset()
+        agent = env.agents[DEFAULT_AGENT_ID]
+
+        self.grid[i] = env.grid.encode()
+        self.contents[i] = 0
+        for k, obj in enumerate(env.grid.grid):
+            if isinstance(obj, Box) and obj.contains is not None:
+                self.contents[i, k % self.width, k // self.width] = obj.contains.encode()
+
+        self.agent_pos[i] = agent.pos
+        self.agent_dir[i] = agent.dir
+        self.carrying[i] = 0
+        self.carrying_contents[i] = 0
+        self.step_count[i] = 0
+        self.missions[i] = env.mission
+
+    def reset(self):
+        for i in range(self.num_envs):
+            self._load(i)
+        return self.gen_obs()
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        idx = np.arange(self.num_envs)
+
+        self.step_count += 1
+        reward = np.zeros(self.num_envs)
+
+        # Contents of the cell in front of each agent
+        fwd_pos = self.agent_pos + self._dir_vec[self.agent_dir]
+        fx, fy = fwd_pos[:, 0], fwd_pos[:, 1]
+        fwd_cell = self.grid[idx, fx, fy]
+        fwd_type, fwd_color, fwd_state = fwd_cell[:, 0], fwd_cell[:, 1], fwd_cell[:, 2]
+        is_door = fwd_type == OBJECT_TO_IDX['door']
+
+        # Rotate left
+        left = actions == self.actions.left
+        self.agent_dir[left] = (self.agent_dir[left] - 1) % 4
+
+        # Rotate right
+        right = actions == self.actions.right
+        self.agent_dir[right] = (self.agent_dir[right] + 1) % 4
+
+        # Move forward
+        forward = actions == self.actions.forward
+        can_overlap = CAN_OVERLAP[fwd_type] | (is_door & (fwd_state == STATE_TO_IDX['open']))
+        move = forward & can_overlap
+        self.agent_pos[move] = fwd_pos[move]
+
+        goal = forward & (fwd_type == OBJECT_TO_IDX['goal'])
+        reward[goal] = 1 - 0.9 * (self.step_count[goal] / self.max_steps)
+        lava = forward & (fwd_type == OBJECT_TO_IDX['lava'])
+        done = goal | lava
+
+        # Pick up an object
+        pickup = (actions == self.actions.pickup) & (self.carrying[:, 0] == 0) & CAN_PICKUP[fwd_type]
+        i, x, y = idx[pickup], fx[pickup], fy[pickup]
+        self.carrying[i] = fwd_cell[i]
+        self.carrying_contents[i] = self.contents[i, x, y]
+        self.grid[i, x, y] = EMPTY_ENCODING
+        self.contents[i, x, y] = 0
+
+        # Drop an object
+        drop = (actions == self.actions.drop) & (self.carrying[:, 0] != 0) & (fwd_type == OBJECT_TO_IDX['empty'])
+        i, x, y = idx[drop], fx[drop], fy[drop]
+        self.grid[i, x, y] = self.carrying[i]
+        self.contents[i, x, y] = self.carrying_contents[i]
+        self.carrying[i] = 0
+        self.carrying_contents[i] = 0
+
+        # Toggle a door, unlocking it if the agent carries the matching key
+        toggle = actions == self.actions.toggle
+        door = toggle & is_door
+        locked = fwd_state == STATE_TO_IDX['locked']
+        has_key = (self.carrying[:, 0] == OBJECT_TO_IDX['key']) & (self.carrying[:, 1] == fwd_color)
+        unlock = door & locked & has_key
+        flip = door & ~locked
+        self.grid[idx[unlock], fx[unlock], fy[unlock], 2] = STATE_TO_IDX['open']
+        self.grid[idx[flip], fx[flip], fy[flip], 2] = fwd_state[flip] ^ 1
+
+        # Toggle a box, replacing it by its contents
+        box = toggle & (fwd_type == OBJECT_TO_IDX['box'])
+        i, x, y = idx[box], fx[box], fy[box]
+        contents = self.contents[i, x, y]
+        empty = contents[:, 0] == 0
+        self.grid[i, x, y] = np.where(empty[:, np.newaxis], EMPTY_ENCODING, contents)
+        self.contents[i, x, y] = 0
+
+        done |= self.step_count >= self.max_steps
+
+        # Generate new levels for the copies whose episode ended
+        for i in np.flatnonzero(done):
+            self._load(i)
+
+        obs = self.gen_obs()
+        infos = [{} for _ in range(self.num_envs)]
+
+        return obs, reward, done, infos
+
+    def gen_obs(self):
+        """
+        Generate the observations of all copies, with the views gathered
+        from the padded grids in a single indexing operation
+        """
+
+        sz = self.agent_view_size
+        offsets = self._view_offsets[self.agent_dir]
+        xs = self.agent_pos[:, 0, np.newaxis, np.newaxis] + offsets[:, 0] + self._pad
+        ys = self.agent_pos[:, 1, np.newaxis, np.newaxis] + offsets[:, 1] + self._pad
+        idx = np.arange(self.num_envs)[:, np.newaxis, np.newaxis]
+        view = self._padded[idx, xs, ys]
+
+        agent_pos = (sz // 2, sz - 1)
+
+        if not self.see_through_walls:
+            vis_mask = Grid.compute_vis(Grid.opaque_mask(view), agent_pos)
+            image = np.where(vis_mask[..., np.newaxis], view, 0).astype('uint8')
+        else:
+            image = view
+
+        # Make it so the agents see what they're carrying
+        empty = self.carrying[:, 0] == 0
+        image[:, agent_pos[0], agent_pos[1]] = np.where(empty[:, np.newaxis], EMPTY_ENCODING, self.carrying)
+
+        return {
+            'image': image,
+            'direction': self.agent_dir.copy(),
+            'mission': list(self.missions)
+        }
+
+    def get_obs_render(self, images, tile_size=TILE_PIXELS//2, out=None):
+        """
+        Render the stacked image observations of the copies, as
+        MiniGridEnv.get_obs_render does for one of them
+        """
+
+        return Grid.render_obs(images, tile_size, out=out)
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
+def _shmem_worker(remote, parent_remote, env_id, indices, shm_name, buffer_shape):
+    """
+    Worker process of ShmemVectorEnv, stepping the copies with the given
+    indices and writing their image observations to shared memory
+    """
+
+    from multiprocessing import shared_memory
+
+    parent_remote.close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    images = np.ndarray(buffer_shape, dtype='uint8', buffer=shm.buf)
+    envs = [gym.make(env_id) for _ in indices]
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+
+            if cmd == 'step':
+                actions, slot = data
+                rewards, dones, directions, infos = [], [], [], []
+                missions = {}
+                for i, env, action in zip(indices, envs, actions):
+                    obs, reward, done, info = env.step(action)
+                    # Only the outcome of the action is sent back, since
+                    # action_info can reference grid objects
+                    action_info = info[DEFAULT_AGENT_ID]['action_info']
+                    infos.append({'action_info': action_info[0]})
+                    if done:
+                        obs = env.reset()
+                        missions[i] = obs['mission']
+                    images[slot, i] = obs['image']
+                    rewards.append(reward)
+                    dones.append(done)
+                    directions.append(obs['direction'])
+                remote.send((rewards, dones, directions, missions, infos))
+
+            elif cmd == 'reset':
+                slot = data
+                directions, missions = [], {}
+                for i, env in zip(indices, envs):
+                    obs = env.reset()
+                    images[slot, i] = obs['image']
+                    directions.append(obs['direction'])
+                    missions[i] = obs['mission']
+                remote.send((directions, missions))
+
+            elif cmd == 'seed':
+                for i, env in zip(indices, envs):
+                    env.seed(data + i)
+                remote.send(None)
+
+            elif cmd == 'close':
+                break
+
+    finally:
+        for env in envs:
+            env.close()
+        shm.close()
+        remote.close()
+
+
+def _release_shm(shm):
+    """
+    Unmap a shared memory block and remove it, if not removed yet
+    """
+
+    try:
+        shm.close()
+    except BufferError:
+        # Arrays still refer to the block at interpreter exit, the
+        # mapping is released with the process
+        pass
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class ShmemVectorEnv:
+    """
+    Run copies of a registered environment in worker processes, each
+    worker stepping several copies. Image observations are written by the
+    workers into a shared memory ring buffer of num_slots steps, so only
+    actions, rewards, dones and a small info summary go through the pipes.
+
+    The images returned by step() and reset() are views into the ring
+    buffer, which remain valid until num_slots more steps have been taken.
+    Copies are reset automatically when their episode ends. The shared
+    memory is removed by close(), but only unmapped once the images
+    returned so far are no longer referenced, so they remain readable.
+    """
+
+    def __init__(self, env_id, num_envs, num_workers=None, num_slots=2, seed=None, context=None):
+        from multiprocessing import shared_memory
+
+        env = gym.make(env_id)
+        assert not env.unwrapped.multiagent, "multi-agent environments are not supported"
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        env.close()
+
+        if num_workers is None:
+            num_workers = min(num_envs, multiprocessing.cpu_count())
+        num_workers = min(num_workers, num_envs)
+
+        self.num_envs = num_envs
+        self.num_slots = num_slots
+        self.slot = 0
+        self.missions = [None] * num_envs
+        self.closed = False
+
+        # Ring buffer of image observations, shared with the workers
+        obs_shape = self.observation_space.spaces['image'].shape
+        buffer_shape = (num_slots, num_envs) + obs_shape
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(buffer_shape)))
+        self.images = np.ndarray(buffer_shape, dtype='uint8', buffer=self.shm.buf)
+
+        # Views of the buffer refer to it, so the block is unmapped (and
+        # removed, if close() wasn't called) only once none are left
+        weakref.finalize(self.images, _release_shm, self.shm)
+
+        # Split the copies between workers as evenly as possible
+        ctx = multiprocessing.get_context(context)
+        self.worker_indices = np.array_split(np.arange(num_envs), num_workers)
+        self.remotes, self.processes = [], []
+        for indices in self.worker_indices:
+            remote, worker_remote = ctx.Pipe()
+            process = ctx.Process(
+                target=_shmem_worker,
+                args=(worker_remote, remote, env_id, indices.tolist(), self.shm.name, buffer_shape),
+                daemon=True
+            )
+            process.start()
+            worker_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        if seed is not None:
+            self.seed(seed)
+
+    def seed(self, seed=1337):
+        for remote in self.remotes:
+            remote.send(('seed', seed))
+        for remote in self.remotes:
+            remote.recv()
+        return [seed + i for i in range(self.num_envs)]
+
+    def _next_slot(self):
+        slot = self.slot
+        self.slot = (self.slot + 1) % self.num_slots
+        return slot
+
+    def _obs(self, slot, directions):
+        return {
+            'image': self.images[slot],
+            'direction': np.array(directions),
+            'mission': list(self.missions)
+        }
+
+    def reset(self):
+        slot = self._next_slot()
+        for remote in self.remotes:
+            remote.send(('reset', slot))
+
+        directions = []
+        for remote in self.remotes:
+            worker_directions, missions = remote.recv()
+            directions.extend(worker_directions)
+            for i, mission in missions.items():
+                self.missions[i] = mission
+
+        return self._obs(slot, directions)
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        slot = self._next_slot()
+        for remote, indices in zip(self.remotes, self.worker_indices):
+            remote.send(('step', (actions[indices], slot)))
+
+        rewards, dones, directions, infos = [], [], [], []
+        for remote in self.remotes:
+            worker_rewards, worker_dones, worker_directions, missions, worker_infos = remote.recv()
+            rewards.extend(worker_rewards)
+            dones.extend(worker_dones)
+            directions.extend(worker_directions)
+            infos.extend(worker_infos)
+            for i, mission in missions.items():
+                self.missions[i] = mission
+
+        return self._obs(slot, directions), np.array(rewards), np.array(dones), infos
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+
+        for remote in self.remotes:
+            remote.send(('close', None))
+        for process in self.processes:
+            process.join()
+        for remote in self.remotes:
+            remote.close()
+
+        # Remove the shared memory block now, the mapping is released once
+        # the images returned so far are no longer referenced
+        self.shm.unlink()
+        del self.images
@@ -120,46 +120,84 @@ class ImgObsWrapper(gym.core.ObservationWrapper):
             return obs['image']
 
 
+def one_hot_table():
+    """
+    One-hot encoding of every possible (type, color, state) cell encoding,
+    indexed by the dot product of the cell encoding with ONE_HOT_STRIDES
+    """
+
+    num_types, num_colors, num_states = len(OBJECT_TO_IDX), len(COLOR_TO_IDX), len(STATE_TO_IDX)
+    types, colors, states = np.meshgrid(
+        np.arange(num_types), np.arange(num_colors), np.arange(num_states), indexing='ij'
+    )
+
+    table = np.zeros((types.size, num_types + num_colors + num_states), dtype='uint8')
+    rows = np.arange(types.size)
+    table[rows, types.ravel()] = 1
+    table[rows, num_types + colors.ravel()] = 1
+    table[rows, num_types + num_colors + states.ravel()] = 1
+
+    return table
+
+
+ONE_HOT_STRIDES = np.array([len(COLOR_TO_IDX) * len(STATE_TO_IDX), len(STATE_TO_IDX), 1])
+ONE_HOT_TABLE = one_hot_table()
+ONE_HOT_PACKED_TABLE = np.packbits(ONE_HOT_TABLE, axis=1)
+
+
+def one_hot(image, packed=False, out=None):
+    """
+    One-hot encoding of an image observation, or of a batch of them of
+    shape (..., width, height, 3), with one bit per object type, color and
+    state for each cell. With packed=True, the bits of each cell are packed
+    into bytes, as np.packbits does.
+    """
+
+    table = ONE_HOT_PACKED_TABLE if packed else ONE_HOT_TABLE
+    return table.take(image @ ONE_HOT_STRIDES, axis=0, out=out)
+
+
 class OneHotPartialObsWrapper(gym.core.ObservationWrapper):
     """
     Wrapper to get a one-hot encoding of a partially observable
-    agent view as observation.
+    agent view as observation. The bits of each cell can be packed into
+    bytes with packed=True. With reuse_buffer=True, observations are
+    written into the same array at every step, instead of a new one.
+    Stacked observations (e.g. from a vector env) are also encoded.
     """
 
-    def __init__(self, env, tile_size=8):
+    def __init__(self, env, tile_size=8, packed=False, reuse_buffer=False):
         super().__init__(env)
 
         self.tile_size = tile_size
+        self.packed = packed
 
         obs_shape = env.observation_space['image'].shape
 
-        # Number of bits per cell
-        num_bits = len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + len(STATE_TO_IDX)
+        # Number of bytes per cell
+        num_bytes = ONE_HOT_PACKED_TABLE.shape[1] if packed else ONE_HOT_TABLE.shape[1]
 
         self.observation_space.spaces["image"] = spaces.Box(
             low=0,
             high=255,
-            shape=(obs_shape[0], obs_shape[1], num_bits),
+            shape=(obs_shape[0], obs_shape[1], num_bytes),
             dtype='uint8'
         )
 
+        self.buffer = None
+        if reuse_buffer:
+            self.buffer = np.zeros(self.observation_space.spaces['image'].shape, dtype='uint8')
+
     def observation(self, obs):
         img = obs['image']
-        out = np.zeros(self.observation_space.shape, dtype='uint8')
-
-        for i in range(img.shape[0]):
-            for j in range(img.shape[1]):
-                type = img[i, j, 0]
-                color = img[i, j, 1]
-                state = img[i, j, 2]
 
-                out[i, j, type] = 1
-                out[i, j, len(OBJECT_TO_IDX) + color] = 1
-                out[i, j, len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + state] = 1
+        out = self.buffer
+        if out is not None and out.shape[:-1] != img.shape[:-1]:
+            out = None
 
         return {
             'mission': obs['mission'],
-            'image': out
+            'image': one_hot(img, self.packed, out)
         }
 
 
@@ -247,15 +285,9 @@ class FullyObsWrapper(gym.core.ObservationWrapper):
 
     def observation(self, obs):
         env = self.unwrapped
-        full_grid = env.grid.encode()
+
+        full_grid = env.gen_full_encoding()
         if env.multiagent:
-            for i, agent_id in enumerate(env.agent_ids):
-                full_grid[env.agents[agent_id].pos[0]][env.agents[agent_id].pos[1]] = np.array([
-                    OBJECT_TO_IDX['agent'],
-                    i,
-                    env.agents[agent_id].dir
-                ]
-                )
             new_obs = {}
             for agent_id in obs:
                 new_obs[agent_id] = {
@@ -264,12 +296,6 @@ class FullyObsWrapper(gym.core.ObservationWrapper):
                 }
             return new_obs
         else:
-            full_grid[env.agents[DEFAULT_AGENT_ID].pos[0]][env.agents[DEFAULT_AGENT_ID].pos[1]] = np.array([
-                OBJECT_TO_IDX['agent'],
-                COLOR_TO_IDX['red'],
-                env.agents[DEFAULT_AGENT_ID].dir
-            ]
-            )
             return {
                 'mission': obs['mission'],
                 'image': full_grid
@@ -345,56 +371,271 @@ class FlattenWrapper(gym.core.ObservationWrapper):
             return obs.flatten()
 
 
+def encode_mission(mission, maxStrLen=96, numCharCodes=27):
+    """
+    One-hot encoding of a mission string, as a (maxStrLen, numCharCodes)
+    float32 array with one row per character
+    """
+
+    assert len(mission) <= maxStrLen, 'mission string too long ({} chars)'.format(len(mission))
+    mission = mission.lower()
+
+    strArray = np.zeros(shape=(maxStrLen, numCharCodes), dtype='float32')
+
+    for idx, ch in enumerate(mission):
+        if ch >= 'a' and ch <= 'z':
+            chNo = ord(ch) - ord('a')
+        elif ch == ' ':
+            chNo = ord('z') - ord('a') + 1
+        assert chNo < numCharCodes, '%s : %d' % (ch, chNo)
+        strArray[idx, chNo] = 1
+
+    return strArray
+
+
+# Flattened one-hot encodings of the missions encoded so far, shared by all
+# the wrappers, keyed by mission string and encoding size
+_mission_encodings = {}
+
+
+def mission_encoding(mission, maxStrLen=96, numCharCodes=27):
+    """
+    Flattened one-hot encoding of a mission string, computed once per
+    mission. The returned array is shared and read-only.
+    """
+
+    key = (mission, maxStrLen, numCharCodes)
+    encoding = _mission_encodings.get(key)
+    if encoding is None:
+        encoding = encode_mission(mission, maxStrLen, numCharCodes).ravel()
+        encoding.flags.writeable = False
+        _mission_encodings[key] = encoding
+
+    return encoding
+
+
 class FlatObsWrapper(gym.core.ObservationWrapper):
     """
     Encode mission strings using a one-hot scheme,
-    and combine these with observed images into one flat array
+    and combine these with observed images into one flat array.
+
+    Learners which embed the mission themselves can get a mission id
+    instead of its one-hot encoding, by passing a dict mapping missions to
+    ids as mission_ids. Missions missing from it are added with the next
+    id, so passing an empty dict numbers missions in order of appearance,
+    and passing the same dict to several envs keeps their ids consistent
+    within one process. Envs running in other processes get a copy of the
+    dict, and only agree on the ids of the missions it already holds.
+    With reuse_buffer=True, observations are written into the same array
+    at every step, instead of a new one.
     """
 
-    def __init__(self, env, maxStrLen=96):
+    def __init__(self, env, maxStrLen=96, reuse_buffer=False, mission_ids=None):
         super().__init__(env)
 
         self.maxStrLen = maxStrLen
         self.numCharCodes = 27
+        self.mission_ids = mission_ids
 
         imgSpace = env.observation_space.spaces['image']
         imgSize = reduce(operator.mul, imgSpace.shape, 1)
 
-        self.observation_space = spaces.Box(
-            low=0,
-            high=255,
-            shape=(imgSize + self.numCharCodes * self.maxStrLen,),
-            dtype='uint8'
-        )
+        if mission_ids is None:
+            self.missionSize = self.numCharCodes * self.maxStrLen
+            self.observation_space = spaces.Box(
+                low=0,
+                high=255,
+                shape=(imgSize + self.missionSize,),
+                dtype='uint8'
+            )
+        else:
+            self.missionSize = 1
+            self.observation_space = spaces.Box(
+                low=0,
+                high=np.append(np.full(imgSize, 255, dtype='float32'), np.inf),
+                dtype='float32'
+            )
 
-        self.cachedStr = None
-        self.cachedArray = None
+        self.buffer = None
+        if reuse_buffer:
+            self.buffer = np.zeros(imgSize + self.missionSize, dtype='float32')
 
     def observation(self, obs):
         image = obs['image']
-        mission = obs['mission']
 
-        # Cache the last-encoded mission string
-        if mission != self.cachedStr:
-            assert len(mission) <= self.maxStrLen, 'mission string too long ({} chars)'.format(len(mission))
-            mission = mission.lower()
+        out = self.buffer
+        if out is not None and out.size != image.size + self.missionSize:
+            out = None
+
+        return self.write(image, obs['mission'], out)
 
-            strArray = np.zeros(shape=(self.maxStrLen, self.numCharCodes), dtype='float32')
+    def write(self, image, mission, out=None):
+        """
+        Write the flat observation of an image and a mission into a given
+        float32 buffer, or a new one
+        """
 
-            for idx, ch in enumerate(mission):
-                if ch >= 'a' and ch <= 'z':
-                    chNo = ord(ch) - ord('a')
-                elif ch == ' ':
-                    chNo = ord('z') - ord('a') + 1
-                assert chNo < self.numCharCodes, '%s : %d' % (ch, chNo)
-                strArray[idx, chNo] = 1
+        size = image.size
+        if out is None:
+            out = np.empty(size + self.missionSize, dtype='float32')
 
-            self.cachedStr = mission
-            self.cachedArray = strArray
+        out[:size] = image.ravel()
+        if self.mission_ids is None:
+            out[size:] = mission_encoding(mission, self.maxStrLen, self.numCharCodes)
+        else:
+            out[size] = self.mission_ids.setdefault(mission, len(self.mission_ids))
 
-        obs = np.concatenate((image.flatten(), self.cachedArray.flatten()))
+        return out
 
-        return obs
+
+class FusedObsWrapper(gym.core.ObservationWrapper):
+    """
+    Compile a chain of observation wrappers into a single transform,
+    producing the same observations as the chain without building the
+    intermediate dicts and arrays of each layer. The chain is given as a
+    list of wrapper classes, or (class, kwargs) pairs, applied in order:
+
+        env = FusedObsWrapper(env, [FullyObsWrapper, ImgObsWrapper, FlattenWrapper])
+
+    The chain may start with FullyObsWrapper, RGBImgObsWrapper,
+    RGBImgPartialObsWrapper or OneHotPartialObsWrapper, followed by either
+    FlatObsWrapper, or ImgObsWrapper and optionally one of WallMaskWrapper
+    and FlattenWrapper. The mission string is only read if the output
+    contains it. With reuse_buffer=True, observations are written into the
+    same array at every step, instead of a new one.
+    """
+
+    SOURCES = ('FullyObsWrapper', 'RGBImgObsWrapper', 'RGBImgPartialObsWrapper', 'OneHotPartialObsWrapper')
+    SINKS = ('WallMaskWrapper', 'FlattenWrapper')
+
+    def __init__(self, env, wrappers, reuse_buffer=False):
+        super().__init__(env)
+        assert not self.unwrapped.multiagent, 'only single-agent observations can be fused'
+        assert len(wrappers) > 0, 'the wrapper chain is empty'
+
+        # Build the chain once, for its observation space and settings
+        chain = env
+        layers = []
+        for wrapper in wrappers:
+            cls, kwargs = wrapper if isinstance(wrapper, tuple) else (wrapper, {})
+            chain = cls(chain, **kwargs)
+            layers.append(chain)
+        self.observation_space = chain.observation_space
+        self.reuse_buffer = reuse_buffer
+
+        # Buffers the image and the output are written into
+        self.buffers = {}
+
+        self.source = self._compile_source(layers)
+        self.sink, self.sink_is_image = self._compile_sink(layers)
+
+        # Mask of the cells kept by WallMaskWrapper, computed from the
+        # first observation, as the wrapper does
+        self.wall_mask = None
+        self.num_kept = None
+
+    def _compile_source(self, layers):
+        """
+        Get the function producing the image of the chain from the
+        observation of the environment, writing it into a given buffer
+        """
+
+        env = self.unwrapped
+        if not layers or type(layers[0]).__name__ not in self.SOURCES:
+            return lambda obs, out: obs['image']
+
+        layer = layers.pop(0)
+        name = type(layer).__name__
+
+        if name == 'FullyObsWrapper':
+            def source(obs, out):
+                return env.gen_full_encoding(out)
+
+        elif name == 'RGBImgObsWrapper':
+            def source(obs, out):
+                return env.render(mode='rgb_array', highlight=False, tile_size=layer.tile_size, out=out)
+
+        elif name == 'RGBImgPartialObsWrapper':
+            def source(obs, out):
+                return env.get_obs_render(obs['image'], tile_size=layer.tile_size, out=out)
+
+        else:
+            def source(obs, out):
+                return one_hot(obs['image'], layer.packed, out)
+
+        return source
+
+    def _compile_sink(self, layers):
+        """
+        Get the function combining the image with the observation of the
+        environment into the output of the chain, and whether the image
+        makes up the output
+        """
+
+        names = [type(layer).__name__ for layer in layers]
+
+        # Chain made of a source only
+        if not names:
+            def sink(obs, image):
+                return {'mission': obs['mission'], 'image': image}
+            return sink, True
+
+        elif names == ['FlatObsWrapper']:
+            layer = layers[0]
+
+            def sink(obs, image):
+                out = self._buffer('out', (image.size + layer.missionSize,), np.dtype('float32'))
+                return layer.write(image, obs['mission'], out)
+            return sink, False
+
+        elif names[0] == 'ImgObsWrapper' and len(names) <= 2 and set(names[1:]) <= set(self.SINKS):
+            if names[1:] == ['WallMaskWrapper']:
+                def sink(obs, image):
+                    cells = image.reshape(-1, 3)
+                    if self.wall_mask is None:
+                        self.wall_mask = cells[:, 0] != OBJECT_TO_IDX['wall']
+                        self.num_kept = np.count_nonzero(self.wall_mask)
+                    out = self._buffer('out', (self.num_kept, 3), image.dtype)
+                    return np.compress(self.wall_mask, cells, axis=0, out=out)
+                return sink, False
+
+            elif names[1:] == ['FlattenWrapper']:
+                def sink(obs, image):
+                    return image.reshape(-1)
+                return sink, True
+
+            else:
+                def sink(obs, image):
+                    return image
+                return sink, True
+
+        assert False, 'unsupported wrapper chain: {}'.format(', '.join(names))
+
+    def _buffer(self, name, shape, dtype):
+        """
+        Get the buffer of a given shape to write an output into, a new
+        one at every step unless buffers are reused
+        """
+
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype or not self.reuse_buffer:
+            buffer = self.buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def observation(self, obs):
+        # The image is written into the output buffer when it makes up the
+        # output, and into a scratch buffer reused at every step otherwise
+        if self.sink_is_image:
+            buffer = self.buffers.get('out') if self.reuse_buffer else None
+            image = self.source(obs, buffer)
+            if self.reuse_buffer and image is not obs['image']:
+                self.buffers['out'] = image
+        else:
+            image = self.source(obs, self.buffers.get('image'))
+            if image is not obs['image']:
+                self.buffers['image'] = image
+
+        return self.sink(obs, image)
 
 
 class ViewSizeWrapper(gym.core.Wrapper):
@@ -1,29 +1,53 @@
 #!/usr/bin/env python3
 
+import os
 import random
 import numpy as np
 import gym
 from gym_minigrid.register import env_list
-from gym_minigrid.minigrid import Grid, OBJECT_TO_IDX
+from gym_minigrid.minigrid import Grid, TileAtlas, OBJECT_TO_IDX
 
 # Test specifically importing a specific environment
 from gym_minigrid.envs import DoorKeyEnv
 
 # Test importing wrappers
 from gym_minigrid.wrappers import *
+from gym_minigrid.vector import VectorMiniGridEnv, ShmemVectorEnv
 
 ##############################################################################
 
 print('%d environments registered' % len(env_list))
 
+def random_actions(env, rng=random):
+    """
+    Random action of the environment, one per active agent for multi-agent
+    environments
+    """
+
+    if not env.unwrapped.multiagent:
+        return rng.randint(0, env.action_space.n - 1)
+    return {agent_id: rng.randint(0, env.action_space.n - 1)
+            for agent_id in env.agent_ids if not env.agents[agent_id].done}
+
+def first_actions(env):
+    """
+    Action 0 for the agent, or for every agent of a multi-agent environment
+    """
+
+    if not env.unwrapped.multiagent:
+        return 0
+    return {agent_id: 0 for agent_id in env.agent_ids}
+
 for env_idx, env_name in enumerate(env_list):
     print('testing {} ({}/{})'.format(env_name, env_idx+1, len(env_list)))
 
     # Load the gym environment
     env = gym.make(env_name)
+    multiagent = env.unwrapped.multiagent
+    agent_id = env.agent_ids[0]
     env.max_steps = min(env.max_steps, 200)
     env.reset()
-    env.render('rgb_array')
+    env.render('rgb_array', agent_id=agent_id)
 
     # Verify that the same seed always produces the same environment
     for i in range(0, 5):
@@ -40,32 +64,40 @@ for env_idx, env_name in enumerate(env_list):
     num_episodes = 0
     while num_episodes < 5:
         # Pick a random action
-        action = random.randint(0, env.action_space.n - 1)
-        
+        action = random_actions(env)
+
         obs, reward, done, info = env.step(action)
+        if multiagent:
+            obs, rewards, done = list(obs.values()), list(reward.values()), done['__all__']
+        else:
+            obs, rewards = [obs], [reward]
 
-        # Validate the agent position
-        assert env.agents[DEFAULT_AGENT_ID].pos[0] < env.width
-        assert env.agents[DEFAULT_AGENT_ID].pos[1] < env.height
+        # Validate the agent positions
+        for agent in env.agents.values():
+            assert agent.pos[0] < env.width
+            assert agent.pos[1] < env.height
 
         # Test observation encode/decode roundtrip
-        img = obs['image']
-        grid, vis_mask = Grid.decode(img)
-        img2 = grid.encode(vis_mask=vis_mask)
-        assert np.array_equal(img, img2)
+        for agent_obs in obs:
+            img = agent_obs['image']
+            grid, vis_mask = Grid.decode(img)
+            img2 = grid.encode(vis_mask=vis_mask)
+            assert np.array_equal(img, img2)
 
         # Test the env to string function
         str(env)
 
-        # Check that the reward is within the specified range
-        assert reward >= env.reward_range[0], reward
-        assert reward <= env.reward_range[1], reward
+        # Check that the reward is within the specified range, less the
+        # penalty of agents colliding with each other
+        for reward in rewards:
+            assert reward >= env.reward_range[0] - multiagent * env.collision_penalty, reward
+            assert reward <= env.reward_range[1], reward
 
         if done:
             num_episodes += 1
             env.reset()
 
-        env.render('rgb_array')
+        env.render('rgb_array', agent_id=agent_id)
 
     # Test the close method
     env.close()
@@ -74,23 +106,35 @@ for env_idx, env_name in enumerate(env_list):
     env = ReseedWrapper(env)
     for _ in range(10):
         env.reset()
-        env.step(0)
+        env.step(first_actions(env))
         env.close()
 
     env = gym.make(env_name)
     env = ImgObsWrapper(env)
     env.reset()
-    env.step(0)
+    env.step(first_actions(env))
     env.close()
 
     # Test the fully observable wrapper
     env = gym.make(env_name)
     env = FullyObsWrapper(env)
     env.reset()
-    obs, _, _, _ = env.step(0)
+    obs, _, _, _ = env.step(first_actions(env))
+    if multiagent:
+        obs = obs[agent_id]
     assert obs['image'].shape == env.observation_space.spaces['image'].shape
     env.close()
 
+    env = gym.make(env_name)
+    env = ViewSizeWrapper(env, 5)
+    env.reset()
+    env.step(first_actions(env))
+    env.close()
+
+    # The following wrappers only support single-agent observations
+    if multiagent:
+        continue
+
     # RGB image observation wrapper
     env = gym.make(env_name)
     env = RGBImgPartialObsWrapper(env)
@@ -105,12 +149,6 @@ for env_idx, env_name in enumerate(env_list):
     env.step(0)
     env.close()
 
-    env = gym.make(env_name)
-    env = ViewSizeWrapper(env, 5)
-    env.reset()
-    env.step(0)
-    env.close()
-
     # Test the wrappers return proper observation spaces.
     wrappers = [
         RGBImgObsWrapper,
@@ -151,3 +189,738 @@ for i in range(0, 500):
     assert agent_sees_goal == goal_visible
     if done:
         env.reset()
+
+##############################################################################
+
+print('testing VectorMiniGridEnv')
+for env_name in ['MiniGrid-DoorKey-8x8-v0', 'MiniGrid-LavaCrossingS9N1-v0', 'MiniGrid-MultiRoom-N2-S4-v0']:
+    num_envs = 4
+    venv = VectorMiniGridEnv(env_name, num_envs, seed=1337)
+    envs = [gym.make(env_name) for _ in range(num_envs)]
+    for i, env in enumerate(envs):
+        env.seed(1337 + i)
+
+    # The batched engine must produce the same transitions as the envs
+    vobs = venv.reset()
+    obs = [env.reset() for env in envs]
+    for _ in range(200):
+        for i in range(num_envs):
+            assert np.array_equal(vobs['image'][i], obs[i]['image'])
+            assert vobs['direction'][i] == obs[i]['direction']
+
+        actions = [random.randint(0, 5) for _ in range(num_envs)]
+        vobs, rewards, dones, _ = venv.step(actions)
+
+        for i, env in enumerate(envs):
+            obs[i], reward, done, _ = env.step(actions[i])
+            assert reward == rewards[i] and done == dones[i]
+            if done:
+                obs[i] = env.reset()
+    venv.close()
+
+##############################################################################
+
+print('testing ShmemVectorEnv')
+env_name = 'MiniGrid-DoorKey-8x8-v0'
+num_envs = 4
+venv = ShmemVectorEnv(env_name, num_envs, num_workers=2, seed=1337)
+envs = [gym.make(env_name) for _ in range(num_envs)]
+for i, env in enumerate(envs):
+    env.seed(1337 + i)
+
+vobs = venv.reset()
+obs = [env.reset() for env in envs]
+for _ in range(100):
+    for i in range(num_envs):
+        assert np.array_equal(vobs['image'][i], obs[i]['image'])
+        assert vobs['mission'][i] == obs[i]['mission']
+
+    actions = [random.randint(0, 5) for _ in range(num_envs)]
+    vobs, rewards, dones, _ = venv.step(actions)
+
+    for i, env in enumerate(envs):
+        obs[i], reward, done, _ = env.step(actions[i])
+        assert reward == rewards[i] and done == dones[i]
+        if done:
+            obs[i] = env.reset()
+
+# Observations remain readable after the env is closed, and the shared
+# memory is removed
+shm_name = venv.shm.name
+kept = vobs['image']
+expected = kept.copy()
+venv.close()
+assert np.array_equal(kept, expected)
+assert not os.path.exists(os.path.join('/dev/shm', shm_name.lstrip('/')))
+del kept
+
+##############################################################################
+
+print('testing TileAtlas')
+env = gym.make('MiniGrid-LockedRoom-v0')
+env.seed(1337)
+env.reset()
+atlas = Grid.get_atlas(8)
+small = TileAtlas(8, max_bytes=16 * 8 * 8 * 3)
+for _ in range(100):
+    # A bounded atlas must evict tiles without changing the frames
+    img = env.render('rgb_array', tile_size=8)
+    Grid.use_atlas(small)
+    assert np.array_equal(env.render('rgb_array', tile_size=8), img)
+    Grid.use_atlas(atlas)
+
+    _, _, done, _ = env.step(random.randint(0, 5))
+    if done:
+        env.reset()
+assert small.stats()['bytes'] <= small.max_bytes
+assert small.stats()['evictions'] > 0
+
+# The agent color of a tile is a color name or its RGB value
+from gym_minigrid.minigrid import Key, COLORS
+tile = Grid.render_tile(Key('blue'), agent_dir=1, tile_size=8, agent_color='green')
+assert np.array_equal(Grid.render_tile(Key('blue'), agent_dir=1, tile_size=8, agent_color=tuple(COLORS['green'])), tile)
+assert np.array_equal(Grid.render_tile(None, agent_dir=0, tile_size=8, agent_color=None),
+                      Grid.render_tile(None, agent_dir=0, tile_size=8))
+
+# Atlases saved to disk or shared through shared memory
+import os, tempfile
+path = os.path.join(tempfile.mkdtemp(), 'atlas.npz')
+atlas.save(path)
+copy = TileAtlas.load(path)
+assert np.array_equal(copy.tiles[:copy.num_tiles], atlas.tiles[:atlas.num_tiles])
+assert np.array_equal(copy.slots, atlas.slots)
+
+# A separate process attaching to a shared atlas must not remove it on exit
+import subprocess, sys
+shm = atlas.share()
+attach_code = """
+import sys
+import numpy as np
+from gym_minigrid.minigrid import TileAtlas
+atlas, copy = TileAtlas.load(sys.argv[1]), TileAtlas.attach(sys.argv[2])
+assert np.array_equal(copy.tiles[:copy.num_tiles], atlas.tiles[:atlas.num_tiles])
+assert np.array_equal(copy.slots, atlas.slots)
+"""
+child_env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+for _ in range(2):
+    subprocess.run([sys.executable, '-c', attach_code, path, shm.name], env=child_env, check=True)
+copy = TileAtlas.attach(shm.name)
+assert np.array_equal(copy.slots, atlas.slots)
+del copy
+shm.close()
+shm.unlink()
+
+##############################################################################
+
+print('testing get_state/set_state')
+for env_name in ['MiniGrid-KeyCorridorS3R3-v0', 'MiniGrid-Dynamic-Obstacles-8x8-v0']:
+    env = gym.make(env_name)
+    env.seed(1337)
+    env.reset()
+    for _ in range(10):
+        env.step(random.randint(0, env.action_space.n - 1))
+
+    # Restoring a state must replay the same transitions, even after the
+    # environment was reset
+    state = env.get_state()
+    actions = [random.randint(0, env.action_space.n - 1) for _ in range(20)]
+    trajs = []
+    for _ in range(2):
+        traj = []
+        for action in actions:
+            obs, reward, done, _ = env.step(action)
+            traj.append((obs['image'].tobytes(), reward, done))
+            if done:
+                break
+        trajs.append(traj)
+        env.reset()
+        env.set_state(state)
+    assert trajs[0] == trajs[1]
+
+##############################################################################
+
+print('testing EpisodeRecorder')
+from gym_minigrid.recording import EpisodeRecorder, EpisodeReader
+path = tempfile.mkdtemp()
+env = EpisodeRecorder(gym.make('MiniGrid-DoorKey-5x5-v0'), path, chunk_size=64, seed=1337)
+episodes = []
+for _ in range(5):
+    obs = env.reset()
+    images, actions = [obs['image']], []
+    for _ in range(30):
+        actions.append(random.randint(0, 6))
+        obs, reward, done, _ = env.step(actions[-1])
+        images.append(obs['image'])
+        if done:
+            break
+    episodes.append((images, actions))
+env.close()
+
+reader = EpisodeReader(path)
+assert reader.num_episodes == len(episodes)
+for i, (images, actions) in enumerate(episodes):
+    records = reader.episode(i)
+    assert np.array_equal(records['image'], np.stack(images))
+    assert list(records['action']) == actions + [-1]
+    assert reader.episodes[i]['seed'] == 1337 + i
+
+# Stepping after the end of an episode, without a reset, is an error
+env = EpisodeRecorder(gym.make('MiniGrid-DoorKey-5x5-v0'), tempfile.mkdtemp())
+env.reset()
+done = False
+while not done:
+    _, _, done, _ = env.step(random.randint(0, 6))
+try:
+    env.step(0)
+    error = None
+except AssertionError as e:
+    error = str(e)
+assert error and 'reset()' in error
+env.close()
+
+##############################################################################
+
+print('testing ReplayLog')
+from gym_minigrid.replay import ReplayLog, ReplayLogger, Replayer
+log = ReplayLog()
+env = ReplayLogger(gym.make('MiniGrid-Dynamic-Obstacles-8x8-v0'), log, seed=1337)
+episodes = []
+for _ in range(3):
+    images = [env.reset()['image']]
+    for _ in range(20):
+        obs, reward, done, _ = env.step(random.randint(0, 2))
+        images.append(obs['image'])
+        if done:
+            break
+    episodes.append(np.stack(images))
+env.close()
+
+path = os.path.join(tempfile.mkdtemp(), 'log.npz')
+log.save(path)
+log = ReplayLog.load(path)
+assert len(log) == len(log.actions) == len(episodes)
+for images, episode in zip(episodes, Replayer().replay_log(log)):
+    assert np.array_equal(episode['image'], images)
+
+# An empty log round-trips to an empty log
+ReplayLog().save(path)
+log = ReplayLog.load(path)
+assert len(log) == 0 and log.actions == [] and log.env_ids == []
+
+##############################################################################
+
+print('testing LevelPool')
+from gym_minigrid.levels import LevelPool
+for process in (False, True):
+    pool = LevelPool(gym.make('MiniGrid-MultiRoom-N6-v0'), size=4, seed=1337, process=process)
+    env = gym.make('MiniGrid-MultiRoom-N6-v0')
+    for i in range(8):
+        obs = pool.reset()
+        assert pool.level_seed == 1337 + i
+        env.seed(1337 + i)
+        assert np.array_equal(obs['image'], env.reset()['image'])
+        assert np.array_equal(pool.grid.encoding, env.grid.encoding)
+        for _ in range(10):
+            action = random.randint(0, 6)
+            assert np.array_equal(pool.step(action)[0]['image'], env.step(action)[0]['image'])
+    pool.close()
+
+# Restored levels keep the settings of the environment they are restored into
+env = gym.make('MiniGrid-MultiRoom-N6-v0')
+env.max_steps = 5
+pool = ViewSizeWrapper(LevelPool(env, size=2, seed=1337), 5)
+ref = ViewSizeWrapper(gym.make('MiniGrid-MultiRoom-N6-v0'), 5)
+ref.unwrapped.max_steps = 5
+ref.seed(1337)
+assert np.array_equal(pool.reset()['image'], ref.reset()['image'])
+assert env.max_steps == 5 and env.agent_view_size == 5
+for i in range(5):
+    obs, _, done, _ = pool.step(2)
+    assert obs['image'].shape == (5, 5, 3)
+    assert done == (i == 4)
+pool.close()
+
+##############################################################################
+
+print('testing LevelCache')
+from gym_minigrid.levels import LevelCache, CachedLevels
+path = tempfile.mkdtemp()
+seeds = [3, 1, 4, 1, 5]
+for _ in range(2):
+    # Levels are generated the first time, then loaded from disk
+    cache = LevelCache(path)
+    env = ReseedWrapper(CachedLevels(gym.make('MiniGrid-KeyCorridorS3R3-v0'), cache), seeds)
+    ref = ReseedWrapper(gym.make('MiniGrid-KeyCorridorS3R3-v0'), seeds)
+    for _ in range(len(seeds)):
+        assert np.array_equal(env.reset()['image'], ref.reset()['image'])
+        for _ in range(10):
+            action = random.randint(0, 6)
+            assert np.array_equal(env.step(action)[0]['image'], ref.step(action)[0]['image'])
+    env.close()
+assert cache.get(gym.make('MiniGrid-KeyCorridorS3R3-v0'), 4) is not None
+assert cache.get(gym.make('MiniGrid-KeyCorridorS3R3-v0'), 9) is None
+
+# The levels of every environment, including its own attributes and the
+# objects carried by agents or held in others, are restored exactly
+from gym_minigrid.levels import generate_level, restore_level, _snapshot_class
+rng = random.Random(1337)
+for env_name in env_list:
+    env, ref = gym.make(env_name), gym.make(env_name)
+    restore_level(env, generate_level(ref, 1337))
+    multiagent = env.unwrapped.multiagent
+    for _ in range(20):
+        action = random_actions(ref, rng)
+        obs, reward, done, _ = env.step(action)
+        ref_obs, ref_reward, ref_done, _ = ref.step(action)
+        if not multiagent:
+            obs, ref_obs, done = {DEFAULT_AGENT_ID: obs}, {DEFAULT_AGENT_ID: ref_obs}, {'__all__': done}
+        assert obs.keys() == ref_obs.keys(), env_name
+        for agent_id in obs:
+            assert np.array_equal(obs[agent_id]['image'], ref_obs[agent_id]['image']), env_name
+        assert np.array_equal(env.grid.encoding, ref.grid.encoding), env_name
+        assert reward == ref_reward, env_name
+        if done['__all__']:
+            break
+
+# Snapshots can only name classes of gym_minigrid
+for name in ['os:system', 'builtins:eval', 'gym_minigrid.minigrid:MiniGridEnv']:
+    try:
+        _snapshot_class(name)
+        error = None
+    except AssertionError as e:
+        error = str(e)
+    assert error == 'unexpected class in level snapshot: %s' % name
+
+# Cached levels keep the settings of the environment they are restored into
+cache = LevelCache(path)
+env = gym.make('MiniGrid-KeyCorridorS3R3-v0')
+env.max_steps = 5
+env = ViewSizeWrapper(CachedLevels(env, cache), 5)
+ref = ViewSizeWrapper(gym.make('MiniGrid-KeyCorridorS3R3-v0'), 5)
+ref.unwrapped.max_steps = 5
+for seed in seeds:
+    env.seed(seed)
+    ref.seed(seed)
+    assert np.array_equal(env.reset()['image'], ref.reset()['image'])
+    assert env.unwrapped.max_steps == 5 and env.unwrapped.agent_view_size == 5
+    for i in range(5):
+        obs, _, done, _ = env.step(0)
+        assert obs['image'].shape == (5, 5, 3)
+        assert done == (i == 4)
+env.close()
+
+##############################################################################
+
+print('testing place_obj')
+import zlib
+from gym_minigrid.minigrid import MiniGridEnv
+env = gym.make('MiniGrid-Dynamic-Obstacles-8x8-v0').unwrapped
+env.reset()
+counts = np.zeros((env.width, env.height))
+for _ in range(1000):
+    pos = env.place_obj(None, top=(1, 1), size=(4, 4), reject_fn=lambda env, pos: pos[0] == 2)
+    assert env.grid.get(*pos) is None and pos[0] != 2
+    assert not np.array_equal(pos, env.agents[DEFAULT_AGENT_ID].pos)
+    counts[tuple(pos)] += 1
+free = np.zeros_like(counts, dtype=bool)
+free[1:5, 1:5] = env.grid.encoding[1:5, 1:5, 0] == OBJECT_TO_IDX['empty']
+free[2, :] = False
+free[tuple(env.agents[DEFAULT_AGENT_ID].pos)] = False
+assert np.array_equal(counts > 0, free)
+try:
+    env.place_obj(None, top=(0, 0), size=(1, 1))
+    assert False
+except RecursionError:
+    pass
+
+# The legacy placement generates the levels of earlier versions
+MiniGridEnv.legacy_placement = True
+env = gym.make('MiniGrid-KeyCorridorS3R3-v0')
+env.seed(1)
+env.reset()
+assert tuple(env.agents[DEFAULT_AGENT_ID].pos) == (3, 3) and env.agents[DEFAULT_AGENT_ID].dir == 3
+assert zlib.crc32(env.grid.encoding.tobytes()) == 2223028016
+MiniGridEnv.legacy_placement = False
+
+##############################################################################
+
+print('testing DynamicObstacles')
+trajs = []
+for _ in range(2):
+    env = gym.make('MiniGrid-Dynamic-Obstacles-64x64-v0')
+    env.seed(1337)
+    env.reset()
+    rng = random.Random(1337)
+    traj = []
+    for _ in range(50):
+        old = [tuple(obst.cur_pos) for obst in env.obstacles]
+        obs, _, _, _ = env.step(rng.randint(0, 2))
+        new = [tuple(obst.cur_pos) for obst in env.obstacles]
+        traj.append(new)
+        # Obstacles move by at most one cell, to distinct free cells
+        assert len(set(new)) == len(new)
+        assert tuple(env.agents[DEFAULT_AGENT_ID].pos) not in new
+        for obst, a, b in zip(env.obstacles, old, new):
+            assert max(abs(a[0] - b[0]), abs(a[1] - b[1])) <= 1
+            assert env.grid.get(*b) is obst
+        assert (env.grid.encoding[:, :, 0] == OBJECT_TO_IDX['ball']).sum() == len(new)
+    trajs.append(traj)
+assert trajs[0] == trajs[1]
+
+##############################################################################
+
+print('testing single-agent step')
+# The single-agent fast path matches the general multi-agent step, for
+# actions given as ints or as numpy arrays
+rng = random.Random(1337)
+env1 = gym.make('MiniGrid-KeyCorridorS3R3-v0').unwrapped
+env2 = gym.make('MiniGrid-KeyCorridorS3R3-v0').unwrapped
+env2.multiagent = True
+array_types = [int, np.int64, np.array, lambda a: np.array([a])]
+for seed in range(5):
+    env1.seed(seed)
+    env2.seed(seed)
+    env1.reset()
+    env2.reset()
+    names1, names2 = [], []
+    for i in range(100):
+        action = rng.randint(0, 6)
+        obs1, reward1, done1, info1 = env1.step(array_types[i % 4](action))
+        obs2, reward2, done2, info2 = env2.step({DEFAULT_AGENT_ID: array_types[(i + seed) % 4](action)})
+        assert np.array_equal(obs1['image'], obs2[DEFAULT_AGENT_ID]['image'])
+        assert reward1 == reward2[DEFAULT_AGENT_ID] and done1 == done2['__all__']
+        names1.append(info1[DEFAULT_AGENT_ID]['action_info'][0])
+        names2.append(info2[DEFAULT_AGENT_ID]['action_info'][0])
+        if done1:
+            break
+    assert names1 == names2
+env1.reset()
+try:
+    env1.step(42)
+    assert False
+except AssertionError as e:
+    assert str(e) == 'unknown action'
+
+##############################################################################
+
+print('testing agent_at')
+rng = random.Random(1337)
+env = gym.make('MiniGrid-MA-Empty-Crowd-32x32-v0').unwrapped
+env.seed(1337)
+env.reset()
+state = env.get_state()
+for _ in range(50):
+    actions = {agent_id: rng.randint(0, 2) for agent_id in env.agent_ids if not env.agents[agent_id].done}
+    _, _, done, _ = env.step(actions)
+    for agent_id, agent in env.agents.items():
+        assert env.agent_at(*agent.pos) == agent_id
+    assert len(env.occupancy) == len(env.agents)
+    if done['__all__']:
+        break
+env.set_state(state)
+for agent_id, agent in env.agents.items():
+    assert env.agent_at(*agent.pos) == agent_id
+
+# Two agents moving into the same cell: the first one moves, the second
+# collides with it and stays in place
+from gym_minigrid.envs.multiagent.ma_empty import MAEmptyEnv
+env = MAEmptyEnv(size=8, agent_start_poses=[(2, 2), (4, 2)], agent_start_dirs=[0, 2])
+_, reward, _, info = env.step({'agent_1': env.actions.forward, 'agent_2': env.actions.forward})
+assert tuple(env.agents['agent_1'].pos) == (3, 2) and tuple(env.agents['agent_2'].pos) == (4, 2)
+assert info['agent_1']['action_info'] == ('forward', None)
+assert info['agent_2']['action_info'] == ('collision', 'agent_1')
+assert reward['agent_2'] == -env.collision_penalty
+assert env.agent_at(3, 2) == 'agent_1' and env.agent_at(4, 2) == 'agent_2'
+assert env.agent_at(2, 2) is None and len(env.occupancy) == 2
+
+##############################################################################
+
+print('testing environments with more agents than colors')
+from gym_minigrid.minigrid import IDX_TO_COLOR
+env = FullyObsWrapper(gym.make('MiniGrid-MA-Empty-Crowd-32x32-v0'))
+env.seed(1337)
+obs = env.reset()
+assert env.render('rgb_array', agent_id='agent_1', tile_size=8).shape == (32 * 8, 32 * 8, 3)
+image = obs['agent_1']['image']
+for i, agent_id in enumerate(env.agent_ids):
+    pos = env.agents[agent_id].pos
+    assert image[pos[0], pos[1], 0] == OBJECT_TO_IDX['agent']
+    assert image[pos[0], pos[1], 1] == i % len(IDX_TO_COLOR)
+assert image[..., 1].max() < len(IDX_TO_COLOR)
+
+##############################################################################
+
+print('testing gen_obs_batch')
+for env_name in ['MiniGrid-MA-SharedSpace-6x11-v0', 'MiniGrid-MA-Empty-Crowd-32x32-v0', 'MiniGrid-KeyCorridorS3R3-v0']:
+    env = gym.make(env_name).unwrapped
+    env.reset()
+    for _ in range(20):
+        images, obs_dict = env.gen_obs_batch()
+        assert images.shape == (len(env.agent_ids), env.agent_view_size, env.agent_view_size, 3)
+        for i, agent_id in enumerate(env.agent_ids):
+            obs = env.gen_obs(agent_id)
+            assert np.array_equal(images[i], obs['image'])
+            assert np.array_equal(obs_dict[agent_id]['image'], obs['image'])
+            assert obs_dict[agent_id]['direction'] == obs['direction']
+        if env.multiagent:
+            actions = {agent_id: random.randint(0, 5) for agent_id in env.agent_ids if not env.agents[agent_id].done}
+            done = env.step(actions)[2]['__all__']
+        else:
+            done = env.step(random.randint(0, 5))[2]
+        if done:
+            env.reset()
+
+##############################################################################
+
+print('testing OneHotPartialObsWrapper')
+from gym_minigrid.wrappers import one_hot, ONE_HOT_TABLE
+from gym_minigrid.minigrid import COLOR_TO_IDX
+def one_hot_loop(img):
+    out = np.zeros(img.shape[:2] + (ONE_HOT_TABLE.shape[1],), dtype='uint8')
+    for i in range(img.shape[0]):
+        for j in range(img.shape[1]):
+            type, color, state = img[i, j]
+            out[i, j, type] = 1
+            out[i, j, len(OBJECT_TO_IDX) + color] = 1
+            out[i, j, len(OBJECT_TO_IDX) + len(COLOR_TO_IDX) + state] = 1
+    return out
+for packed in (False, True):
+    for reuse_buffer in (False, True):
+        env = OneHotPartialObsWrapper(gym.make('MiniGrid-KeyCorridorS3R3-v0'), packed=packed, reuse_buffer=reuse_buffer)
+        env.reset()
+        for _ in range(20):
+            obs, _, _, _ = env.step(random.randint(0, 5))
+            expected = one_hot_loop(env.unwrapped.gen_obs()['image'])
+            if packed:
+                expected = np.packbits(expected, axis=-1)
+            assert obs['image'].shape == env.observation_space['image'].shape
+            assert np.array_equal(obs['image'], expected)
+images = np.stack([env.unwrapped.gen_obs()['image'], env.unwrapped.reset()['image']])
+batch = one_hot(images)
+assert np.array_equal(batch[0], one_hot_loop(images[0]))
+assert np.array_equal(batch[1], one_hot_loop(images[1]))
+
+##############################################################################
+
+print('testing FusedObsWrapper')
+def same_obs(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(same_obs(a[k], b[k]) for k in a)
+    if isinstance(a, np.ndarray):
+        return a.dtype == b.dtype and np.array_equal(a, b)
+    return a == b
+for chain in [
+    [FullyObsWrapper],
+    [FullyObsWrapper, ImgObsWrapper, FlattenWrapper],
+    [FullyObsWrapper, ImgObsWrapper, WallMaskWrapper],
+    [FullyObsWrapper, FlatObsWrapper],
+    [(RGBImgPartialObsWrapper, {'tile_size': 4}), ImgObsWrapper],
+    [RGBImgObsWrapper, FlatObsWrapper],
+    [OneHotPartialObsWrapper, ImgObsWrapper],
+    [ImgObsWrapper, FlattenWrapper],
+]:
+    for reuse_buffer in (False, True):
+        env = gym.make('MiniGrid-KeyCorridorS3R3-v0')
+        for wrapper in chain:
+            cls, kwargs = wrapper if isinstance(wrapper, tuple) else (wrapper, {})
+            env = cls(env, **kwargs)
+        fused = FusedObsWrapper(gym.make('MiniGrid-KeyCorridorS3R3-v0'), chain, reuse_buffer=reuse_buffer)
+        env.seed(1)
+        fused.seed(1)
+        assert same_obs(env.reset(), fused.reset())
+        for _ in range(20):
+            action = random.randint(0, 5)
+            obs, _, done, _ = env.step(action)
+            assert same_obs(obs, fused.step(action)[0])
+            if done:
+                break
+try:
+    FusedObsWrapper(gym.make('MiniGrid-KeyCorridorS3R3-v0'), [])
+    error = None
+except AssertionError as e:
+    error = str(e)
+assert error == 'the wrapper chain is empty'
+
+##############################################################################
+
+print('testing FullyObsWrapper')
+from gym_minigrid.minigrid import Door
+def full_obs_loop(env):
+    full_grid = np.zeros((env.width, env.height, 3), dtype='uint8')
+    for i in range(env.width):
+        for j in range(env.height):
+            v = env.grid.get(i, j)
+            full_grid[i, j] = v.encode() if v else (OBJECT_TO_IDX['empty'], 0, 0)
+    for i, agent_id in enumerate(env.agent_ids):
+        agent = env.agents[agent_id]
+        full_grid[agent.pos[0], agent.pos[1]] = (OBJECT_TO_IDX['agent'], i, agent.dir)
+    return full_grid
+for env_name in ['MiniGrid-MultiRoom-N6-v0', 'MiniGrid-ObstructedMaze-Full-v0', 'MiniGrid-MA-MACounterCirc-v0']:
+    env = FullyObsWrapper(gym.make(env_name))
+    unwrapped = env.unwrapped
+    env.reset()
+    for _ in range(100):
+        if unwrapped.multiagent:
+            actions = {agent_id: random.randint(0, 5) for agent_id in unwrapped.agent_ids if not unwrapped.agents[agent_id].done}
+            obs, _, done, _ = env.step(actions)
+            obs, done = obs[next(iter(obs))], done['__all__']
+        else:
+            obs, _, done, _ = env.step(random.randint(0, 5))
+        assert np.array_equal(obs['image'], full_obs_loop(unwrapped))
+        if done:
+            env.reset()
+
+    # Doors changed outside of actions are also re-encoded
+    doors = [(k, v) for k, v in unwrapped.grid._stateful.items() if isinstance(v, Door)]
+    for k, door in doors:
+        door.is_open = not door.is_open
+        assert np.array_equal(unwrapped.gen_full_encoding(), full_obs_loop(unwrapped))
+
+##############################################################################
+
+print('testing FlatObsWrapper')
+from gym_minigrid.wrappers import encode_mission
+mission_ids = {}
+for reuse_buffer in (False, True):
+    env = FlatObsWrapper(gym.make('MiniGrid-Fetch-8x8-N3-v0'), reuse_buffer=reuse_buffer)
+    id_env = FlatObsWrapper(gym.make('MiniGrid-Fetch-8x8-N3-v0'), mission_ids=mission_ids)
+    for seed in range(10):
+        env.seed(seed)
+        id_env.seed(seed)
+        obs, id_obs = env.reset(), id_env.reset()
+        mission = env.unwrapped.mission
+        image = env.unwrapped.gen_obs()['image']
+        expected = np.concatenate((image.flatten(), encode_mission(mission).flatten()))
+        assert obs.dtype == expected.dtype and np.array_equal(obs, expected)
+        assert np.array_equal(id_obs[:-1], image.flatten())
+        assert id_obs[-1] == mission_ids[mission]
+        assert id_env.observation_space.contains(id_obs)
+assert sorted(mission_ids.values()) == list(range(len(mission_ids)))
+
+##############################################################################
+
+print('testing RGBImgPartialObsWrapper')
+def obs_render_decode(env, image, tile_size):
+    grid, vis_mask = Grid.decode(image)
+    sz = env.agent_view_size
+    return grid.render(tile_size, [(sz // 2, sz - 1)], [3], ['red'], highlight_mask=vis_mask)
+for env_name in ['MiniGrid-KeyCorridorS3R3-v0', 'MiniGrid-LavaGapS5-v0', 'MiniGrid-ObstructedMaze-2Dlh-v0']:
+    env = RGBImgPartialObsWrapper(gym.make(env_name), tile_size=8)
+    env.reset()
+    for _ in range(20):
+        obs, _, done, _ = env.step(random.randint(0, 5))
+        expected = obs_render_decode(env.unwrapped, env.unwrapped.gen_obs()['image'], 8)
+        assert np.array_equal(obs['image'], expected)
+        if done:
+            env.reset()
+venv = VectorMiniGridEnv('MiniGrid-DoorKey-8x8-v0', num_envs=8, seed=0)
+images = venv.reset()['image']
+frames = venv.get_obs_render(images, tile_size=4)
+assert frames.shape == (8, 7 * 4, 7 * 4, 3)
+for i in range(8):
+    assert np.array_equal(frames[i], obs_render_decode(venv, images[i], 4))
+
+##############################################################################
+
+print('testing star import of gym_minigrid.envs')
+star = {}
+exec('from gym_minigrid.envs import *', star)
+for name in ['DoorKeyEnv', 'MultiRoomEnv', 'RoomGrid', 'Grid', 'MiniGridEnv', 'Goal', 'register']:
+    assert name in star, name
+import gym_minigrid.envs
+assert 'DoorKeyEnv' in dir(gym_minigrid.envs)
+
+##############################################################################
+
+print('testing vectorized rasterization')
+import math
+import gym_minigrid.minigrid as minigrid_module
+
+# Per-pixel reference implementations of the rasterization functions
+def ref_fill_coords(img, fn, color):
+    for y in range(img.shape[0]):
+        for x in range(img.shape[1]):
+            yf = (y + 0.5) / img.shape[0]
+            xf = (x + 0.5) / img.shape[1]
+            if fn(xf, yf):
+                img[y, x] = color
+    return img
+
+def ref_rotate_fn(fin, cx, cy, theta):
+    def fout(x, y):
+        x = x - cx
+        y = y - cy
+        x2 = cx + x * math.cos(-theta) - y * math.sin(-theta)
+        y2 = cy + y * math.cos(-theta) + x * math.sin(-theta)
+        return fin(x2, y2)
+    return fout
+
+def ref_point_in_line(x0, y0, x1, y1, r):
+    p0 = np.array([x0, y0])
+    p1 = np.array([x1, y1])
+    dir = p1 - p0
+    dist = np.linalg.norm(dir)
+    dir = dir / dist
+    xmin = min(x0, x1) - r
+    xmax = max(x0, x1) + r
+    ymin = min(y0, y1) - r
+    ymax = max(y0, y1) + r
+    def fn(x, y):
+        if x < xmin or x > xmax or y < ymin or y > ymax:
+            return False
+        q = np.array([x, y])
+        a = np.clip(np.dot(q - p0, dir), 0, dist)
+        return np.linalg.norm(q - (p0 + a * dir)) <= r
+    return fn
+
+def ref_point_in_circle(cx, cy, r):
+    def fn(x, y):
+        return (x-cx)*(x-cx) + (y-cy)*(y-cy) <= r * r
+    return fn
+
+def ref_point_in_rect(xmin, xmax, ymin, ymax):
+    def fn(x, y):
+        return x >= xmin and x <= xmax and y >= ymin and y <= ymax
+    return fn
+
+def ref_point_in_triangle(a, b, c):
+    a = np.array(a)
+    b = np.array(b)
+    c = np.array(c)
+    def fn(x, y):
+        v0 = c - a
+        v1 = b - a
+        v2 = np.array((x, y)) - a
+        dot00 = np.dot(v0, v0)
+        dot01 = np.dot(v0, v1)
+        dot02 = np.dot(v0, v2)
+        dot11 = np.dot(v1, v1)
+        dot12 = np.dot(v1, v2)
+        inv_denom = 1 / (dot00 * dot11 - dot01 * dot01)
+        u = (dot11 * dot02 - dot01 * dot12) * inv_denom
+        v = (dot00 * dot12 - dot01 * dot02) * inv_denom
+        return (u >= 0) and (v >= 0) and (u + v) < 1
+    return fn
+
+# Every tile of the atlas must be bit-identical to the per-pixel rendering.
+# Highlighting is applied to the rasterized tile, so only tiles without it
+# are compared.
+ref_fns = {
+    'fill_coords': ref_fill_coords,
+    'rotate_fn': ref_rotate_fn,
+    'point_in_line': ref_point_in_line,
+    'point_in_circle': ref_point_in_circle,
+    'point_in_rect': ref_point_in_rect,
+    'point_in_triangle': ref_point_in_triangle,
+}
+for tile_size in [5, 8, 11]:
+    atlas = TileAtlas(tile_size).precompute()
+    saved = {name: getattr(minigrid_module, name) for name in ref_fns}
+    vars(minigrid_module).update(ref_fns)
+    try:
+        for slot in range(atlas.num_tiles):
+            key = atlas.keys[slot]
+            if not atlas.unpack_key(key)[3]:
+                assert np.array_equal(atlas.render_key(key), atlas.tiles[slot]), (tile_size, key)
+    finally:
+        vars(minigrid_module).update(saved)
@@ -6,7 +6,8 @@ setup(
     keywords='memory, environment, agent, rl, openaigym, openai-gym, gym',
     url='https://github.com/maximecb/gym-minigrid',
     description='Minimalistic gridworld package for OpenAI Gym',
-    packages=['gym_minigrid', 'gym_minigrid.envs'],
+    packages=['gym_minigrid', 'gym_minigrid.envs', 'gym_minigrid.envs.multiagent'],
+    python_requires='>=3.8',
     install_requires=[
         'gym>=0.9.6',
         'numpy>=1.15.0'